@@ -0,0 +1,297 @@
+"""SQLite 归档存储：合并结果的另一种保存方式。
+
+合并结果保存在 ``*_merged.json`` 中时，更新几个媒体文件名也要重写整个文件。
+本模块把归档拆成四张表：
+
+- ``tweets``：每条推文一行，正文 JSON 中去掉了媒体与头像的本地文件名；
+- ``users``：用户名、昵称与头像，头像文件名按用户记录；
+- ``media``：每条推文（含引用、转推、回复父推文）的每个媒体一行，记录本地文件名；
+- ``ordering``：合并后的顺序及需要明确记录的原始父节点。
+
+写入时按 ``merge_versions`` 的规则与已有版本合并；读取时按顺序分页查询，
+再从 users / media 表补回文件名。
+"""
+
+import json
+import logging
+import sqlite3
+
+from tweet_record import merge_versions
+
+_logger = logging.getLogger(__name__)
+
+_NESTED_KEYS = ("quoted_tweet", "retweeted_tweet", "in_reply_to_tweet")
+_BATCH_SIZE = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tweets (
+    tweet_id TEXT PRIMARY KEY,
+    user_id TEXT,
+    created_at_ms INTEGER,
+    updated_at_ms INTEGER,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tweets_user_id ON tweets (user_id);
+CREATE INDEX IF NOT EXISTS tweets_created_at_ms ON tweets (created_at_ms);
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    user_name TEXT,
+    user_nick TEXT,
+    avatar_url TEXT,
+    avatar_filename TEXT,
+    updated_at_ms INTEGER
+);
+CREATE TABLE IF NOT EXISTS media (
+    tweet_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    type TEXT,
+    media_url TEXT,
+    filename TEXT,
+    PRIMARY KEY (tweet_id, idx)
+);
+CREATE TABLE IF NOT EXISTS ordering (
+    position INTEGER PRIMARY KEY,
+    tweet_id TEXT NOT NULL UNIQUE,
+    original_parents TEXT
+);
+"""
+
+_UPSERT_TWEET = """
+INSERT INTO tweets VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (tweet_id) DO UPDATE SET
+    user_id = excluded.user_id,
+    created_at_ms = excluded.created_at_ms,
+    updated_at_ms = excluded.updated_at_ms,
+    data = excluded.data
+"""
+
+# 较新的用户信息胜出；头像文件名按用户固定，没有新文件名时保留原有的
+_UPSERT_USER = """
+INSERT INTO users VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (user_id) DO UPDATE SET
+    user_name = excluded.user_name,
+    user_nick = excluded.user_nick,
+    avatar_url = excluded.avatar_url,
+    avatar_filename = coalesce(excluded.avatar_filename, users.avatar_filename),
+    updated_at_ms = excluded.updated_at_ms
+WHERE excluded.updated_at_ms >= users.updated_at_ms
+"""
+
+# 媒体地址不变时保留已下载的文件名
+_UPSERT_MEDIA = """
+INSERT INTO media VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (tweet_id, idx) DO UPDATE SET
+    type = excluded.type,
+    media_url = excluded.media_url,
+    filename = CASE WHEN excluded.media_url IS media.media_url
+        THEN coalesce(excluded.filename, media.filename)
+        ELSE excluded.filename END
+"""
+
+
+def _walk(tweet):
+    """产出推文本身及其中嵌套的引用、转推与回复父推文。"""
+    yield tweet
+    for key in _NESTED_KEYS:
+        if nested := tweet.get(key):
+            yield from _walk(nested)
+
+
+def _placeholders(values):
+    return ",".join("?" * len(values))
+
+
+class ArchiveStore:
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def count(self):
+        return self._conn.execute("SELECT COUNT(*) FROM ordering").fetchone()[0]
+
+    def write_merged(self, tweets):
+        """按顺序写入合并结果，不在其中的推文被删除；一次事务内完成。"""
+        with self._conn:
+            self._conn.execute("DELETE FROM ordering")
+            batch = []
+            position = 0
+            for tweet in tweets:
+                batch.append((position, tweet))
+                position += 1
+                if len(batch) >= _BATCH_SIZE:
+                    self._upsert(batch)
+                    batch = []
+            self._upsert(batch)
+            removed = self._conn.execute(
+                "DELETE FROM tweets WHERE tweet_id NOT IN (SELECT tweet_id FROM ordering)"
+            ).rowcount
+        if removed:
+            _logger.info(f"已从归档数据库删除 {removed} 条不在合并结果中的推文")
+        return position
+
+    def _upsert(self, batch):
+        if not batch:
+            return
+        ids = [tweet["tweet_id"] for _, tweet in batch]
+        existing = dict(
+            self._conn.execute(
+                f"SELECT tweet_id, data FROM tweets WHERE tweet_id IN ({_placeholders(ids)})",
+                ids,
+            )
+        )
+        order_rows, tweet_rows, user_rows, media_rows = [], [], [], []
+        for position, tweet in batch:
+            tweet_id = tweet["tweet_id"]
+            parents = tweet.pop("original_parents", None)
+            order_rows.append(
+                (position, tweet_id, None if parents is None else json.dumps(parents))
+            )
+            rows = self._strip_files(tweet)
+            data = json.dumps(tweet, ensure_ascii=False, default=str)
+            old_data = existing.get(tweet_id)
+            node_tweet = tweet
+            if old_data is not None and old_data != data:
+                node_tweet, _ = merge_versions(tweet, json.loads(old_data))
+                if node_tweet is not tweet:
+                    # 库中的版本更新：保留原有的推文、用户与媒体记录
+                    rows = ([], [])
+                data = json.dumps(node_tweet, ensure_ascii=False, default=str)
+            user_rows += rows[0]
+            media_rows += rows[1]
+            if old_data != data:
+                tweet_rows.append(
+                    (
+                        tweet_id,
+                        node_tweet.get("user_id"),
+                        node_tweet.get("tweet_created_at_ms"),
+                        node_tweet.get("updated_at_ms"),
+                        data,
+                    )
+                )
+        self._conn.executemany("INSERT INTO ordering VALUES (?, ?, ?)", order_rows)
+        self._conn.executemany(_UPSERT_TWEET, tweet_rows)
+        self._conn.executemany(_UPSERT_USER, user_rows)
+        self._conn.executemany(_UPSERT_MEDIA, media_rows)
+
+    @staticmethod
+    def _strip_files(tweet):
+        """取出本地文件名，返回 (users 行, media 行)；没有 ID 的推文保持原样。"""
+        updated_at_ms = tweet.get("updated_at_ms")
+        user_rows, media_rows = [], []
+        for t in _walk(tweet):
+            if not t.get("tweet_id"):
+                continue
+            if (avatar := t.get("avatar")) is not None and t.get("user_id"):
+                user_rows.append(
+                    (
+                        t["user_id"],
+                        t.get("user_name"),
+                        t.get("user_nick"),
+                        avatar.get("media_url"),
+                        avatar.pop("filename", None),
+                        updated_at_ms,
+                    )
+                )
+            for idx, media_item in enumerate(t.get("tweet_media") or []):
+                media_rows.append(
+                    (
+                        t["tweet_id"],
+                        idx,
+                        media_item.get("type"),
+                        media_item.get("media_url"),
+                        media_item.pop("filename", None),
+                    )
+                )
+        return user_rows, media_rows
+
+    def iter_pages(self, page_size=_BATCH_SIZE, first_page_size=None):
+        """按合并顺序逐页产出推文列表（按位置分页，每页一次查询）。
+
+        first_page_size 为第一页的条数（默认与 page_size 相同）。
+        每页读取前提交此前的 update_media，中断后已完成的更新不会丢失。
+        """
+        last_position = -1
+        limit = first_page_size or page_size
+        while True:
+            self._conn.commit()
+            rows = self._conn.execute(
+                "SELECT o.position, o.original_parents, t.data"
+                " FROM ordering o JOIN tweets t USING (tweet_id)"
+                " WHERE o.position > ? ORDER BY o.position LIMIT ?",
+                (last_position, limit),
+            ).fetchall()
+            if not rows:
+                return
+            tweets = []
+            for _, parents, data in rows:
+                tweet = json.loads(data)
+                if parents is not None:
+                    tweet["original_parents"] = json.loads(parents)
+                tweets.append(tweet)
+            self._attach_files(tweets)
+            yield tweets
+            last_position = rows[-1][0]
+            limit = page_size
+
+    def iter_tweets(self, page_size=_BATCH_SIZE):
+        for page in self.iter_pages(page_size):
+            yield from page
+
+    def _attach_files(self, tweets):
+        objects = [t for tweet in tweets for t in _walk(tweet) if t.get("tweet_id")]
+        tweet_ids = list({t["tweet_id"] for t in objects})
+        user_ids = list({t["user_id"] for t in objects if t.get("user_id")})
+        media = {}
+        for i in range(0, len(tweet_ids), _BATCH_SIZE):
+            chunk = tweet_ids[i : i + _BATCH_SIZE]
+            for tweet_id, idx, media_url, filename in self._conn.execute(
+                "SELECT tweet_id, idx, media_url, filename FROM media"
+                f" WHERE filename IS NOT NULL AND tweet_id IN ({_placeholders(chunk)})",
+                chunk,
+            ):
+                media[tweet_id, idx] = (media_url, filename)
+        avatars = {}
+        for i in range(0, len(user_ids), _BATCH_SIZE):
+            chunk = user_ids[i : i + _BATCH_SIZE]
+            avatars |= self._conn.execute(
+                "SELECT user_id, avatar_filename FROM users"
+                f" WHERE avatar_filename IS NOT NULL AND user_id IN ({_placeholders(chunk)})",
+                chunk,
+            ).fetchall()
+        for t in objects:
+            if (avatar := t.get("avatar")) is not None and t.get("user_id") in avatars:
+                avatar["filename"] = avatars[t["user_id"]]
+            for idx, media_item in enumerate(t.get("tweet_media") or []):
+                found = media.get((t["tweet_id"], idx))
+                if found and found[0] == media_item.get("media_url"):
+                    media_item["filename"] = found[1]
+
+    def update_media(self, tweet):
+        """只更新文件名有变化的 users / media 行，返回更新的行数。"""
+        before = self._conn.total_changes
+        for t in _walk(tweet):
+            if not t.get("tweet_id"):
+                continue
+            avatar = t.get("avatar") or {}
+            if avatar.get("filename") and t.get("user_id"):
+                self._conn.execute(
+                    "UPDATE users SET avatar_filename = ?"
+                    " WHERE user_id = ? AND avatar_filename IS NOT ?",
+                    (avatar["filename"], t["user_id"], avatar["filename"]),
+                )
+            for idx, media_item in enumerate(t.get("tweet_media") or []):
+                if filename := media_item.get("filename"):
+                    self._conn.execute(
+                        "UPDATE media SET filename = ? WHERE tweet_id = ? AND idx = ?"
+                        " AND media_url IS ? AND filename IS NOT ?",
+                        (filename, t["tweet_id"], idx, media_item.get("media_url"), filename),
+                    )
+        return self._conn.total_changes - before
+
+    def commit(self):
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,86 @@
+"""解析器基准：对比 TweetParser 与 TweetRecord 解析同一批 Likes 条目的耗时。
+
+条目由 mock_server.LikesTimeline 确定性生成，不需要网络::
+
+    python bench_parser.py                 # 100k 条
+    python bench_parser.py --entries 20000 --repeat 5
+
+计时前会逐条比较两者的输出，结构不一致时直接报错。
+"""
+
+import time
+
+import time_util
+from mock_server import LikesTimeline
+from tweet_parser import TweetParser
+from tweet_record import parse_entry
+
+
+def generate_entries(count, seed=0):
+    timeline = LikesTimeline(likes=count, seed=seed)
+    return [timeline.entry(i) for i in range(count)]
+
+
+def parse_with_parser(entries):
+    tweets = []
+    for entry in entries:
+        tweet_parser = TweetParser(entry)
+        if tweet_parser.data_type == "tweet":
+            tweets.append(tweet_parser.tweet_as_json())
+    return tweets
+
+
+def parse_with_record(entries):
+    tweets = []
+    for entry in entries:
+        data_type, record = parse_entry(entry)
+        if data_type == "tweet":
+            tweets.append(record.as_json())
+    return tweets
+
+
+def bench(entries, repeat):
+    expected = parse_with_parser(entries)
+    actual = parse_with_record(entries)
+    if expected != actual:
+        for i, (a, b) in enumerate(zip(expected, actual)):
+            if a != b:
+                raise AssertionError(f"第 {i} 条输出不一致：\n{a}\n{b}")
+        raise AssertionError(f"推文数量不一致：{len(expected)} != {len(actual)}")
+
+    results = {}
+    for name, func in (
+        ("TweetParser", parse_with_parser),
+        ("TweetRecord", parse_with_record),
+    ):
+        best = min(_timed(func, entries) for _ in range(repeat))
+        results[name] = best
+        print(
+            f"{name:>12}: {best:7.3f}s  {len(entries) / best:10.0f} entries/s",
+            flush=True,
+        )
+    print(f"{'speedup':>12}: {results['TweetParser'] / results['TweetRecord']:7.2f}x")
+    return results
+
+
+def _timed(func, entries):
+    # 清空时间转换缓存，避免前一轮结果让后一轮占便宜
+    time_util._convert_cached.cache_clear()
+    time_util.to_epoch_ms.cache_clear()
+    start = time.perf_counter()
+    func(entries)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark likes entry parsing")
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    entries = generate_entries(args.entries, args.seed)
+    print(f"{len(entries)} entries")
+    bench(entries, args.repeat)
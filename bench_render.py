@@ -0,0 +1,148 @@
+"""建站渲染基准：对比逐条 include 推文卡片与调用宏两种渲染方式的耗时。
+
+推文由 mock_server.LikesTimeline 确定性生成，不需要网络::
+
+    python bench_render.py                    # 50k 条，每页 100 条
+    python bench_render.py --tweets 10000 --items-per-page 200
+    python bench_render.py --baseline-theme /path/to/old/site_theme
+
+"include" 按旧的方式渲染：每次新建不带字节码缓存的 Environment，每条推文
+``{% include "_tweet_card.html" %}``；"macro" 使用 build_site 的 Environment
+（字节码缓存、不检查模板修改时间）并调用 ``_macros.html`` 中的 tweet_card 宏。
+--baseline-theme 可指向改为宏之前的主题目录，测量原先递归 include 的卡片。
+计时前会核对两者（忽略空白后）的输出一致。
+"""
+
+import re
+import tempfile
+import time
+from pathlib import Path
+
+from jinja2 import ChoiceLoader, DictLoader, Environment, FileSystemLoader, select_autoescape
+
+from build_site import _create_env, _precompile_theme
+from mock_server import LikesTimeline
+from time_util import format_epoch_ms
+from tweet_record import add_epoch_ms, parse_entry
+
+ROOT_DIR = Path(__file__).resolve().parent
+
+_INCLUDE_LIST = (
+    '{% for tweet in tweets %}{% include "_tweet_card.html" %}{% endfor %}'
+)
+_MACRO_LIST = (
+    '{% from "_macros.html" import tweet_card %}'
+    "{% for tweet in tweets %}{{ tweet_card(tweet, base_path) }}{% endfor %}"
+)
+
+
+def generate_tweets(count, seed=0):
+    timeline = LikesTimeline(likes=count, seed=seed)
+    tweets = []
+    for i in range(count):
+        data_type, record = parse_entry(timeline.entry(i))
+        if data_type == "tweet":
+            tweets.append(add_epoch_ms(record.as_json()))
+    return tweets
+
+
+def include_env(theme_dir, cfg):
+    """旧的 Environment：没有字节码缓存，每次取模板都检查修改时间。"""
+    env = Environment(
+        loader=ChoiceLoader(
+            [DictLoader({"list.html": _INCLUDE_LIST}), FileSystemLoader(str(theme_dir))]
+        ),
+        autoescape=select_autoescape(["html", "xml"]),
+        trim_blocks=True,
+        lstrip_blocks=True,
+    )
+    env.filters["localtime"] = lambda epoch_ms: (
+        "" if epoch_ms is None else format_epoch_ms(epoch_ms, cfg["timezone"])
+    )
+    env.filters["thumbnail"] = lambda filename, base_path="": None
+    return env
+
+
+def macro_env(theme_dir, cfg):
+    env = _create_env(cfg, theme_dir, {})
+    env.loader = ChoiceLoader([DictLoader({"list.html": _MACRO_LIST}), env.loader])
+    return env
+
+
+def render_pages(env, pages):
+    tpl = env.get_template("list.html")
+    return [tpl.render(tweets=page, base_path="") for page in pages]
+
+
+def _normalize(html):
+    return re.sub(r"\s+", " ", re.sub(r">\s+<", "><", html)).strip()
+
+
+def bench(tweets, items_per_page, theme_dir, baseline_theme, repeat):
+    pages = [
+        tweets[i : i + items_per_page] for i in range(0, len(tweets), items_per_page)
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        cfg = {"site_path": Path(tmp), "timezone": "UTC"}
+
+        # 编译：冷启动写入字节码缓存，之后的构建直接载入
+        start = time.perf_counter()
+        _precompile_theme(_create_env(cfg, theme_dir, {}))
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        _precompile_theme(_create_env(cfg, theme_dir, {}))
+        warm = time.perf_counter() - start
+        print(
+            f"{'compile':>8}: 无缓存 {cold * 1000:7.1f}ms  "
+            f"字节码缓存 {warm * 1000:7.1f}ms ({cold / warm:4.1f}x)",
+            flush=True,
+        )
+
+        expected = render_pages(include_env(baseline_theme, cfg), pages[:1])
+        actual = render_pages(macro_env(theme_dir, cfg), pages[:1])
+        if _normalize(expected[0]) != _normalize(actual[0]):
+            raise AssertionError("include 与宏渲染的页面不一致")
+
+        results = {}
+        for name, make_env, theme in (
+            ("include", include_env, baseline_theme),
+            ("macro", macro_env, theme_dir),
+        ):
+            best = min(_timed(make_env, theme, cfg, pages) for _ in range(repeat))
+            results[name] = best
+            print(
+                f"{name:>8}: {best:7.3f}s  {len(tweets) / best:8.0f} tweets/s",
+                flush=True,
+            )
+    print(f"{'speedup':>8}: {results['include'] / results['macro']:7.2f}x")
+    return results
+
+
+def _timed(make_env, theme_dir, cfg, pages):
+    # 每轮新建 Environment，与每次建站时一样从头载入模板
+    start = time.perf_counter()
+    render_pages(make_env(theme_dir, cfg), pages)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark site page rendering")
+    parser.add_argument("--tweets", type=int, default=50_000)
+    parser.add_argument("--items-per-page", type=int, default=100)
+    parser.add_argument("--theme", type=Path, default=ROOT_DIR / "site_theme")
+    parser.add_argument("--baseline-theme", type=Path, default=None)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    tweets = generate_tweets(args.tweets, args.seed)
+    print(f"{len(tweets)} tweets")
+    bench(
+        tweets,
+        args.items_per_page,
+        args.theme,
+        args.baseline_theme or args.theme,
+        args.repeat,
+    )
@@ -0,0 +1,139 @@
+"""端到端抓取基准：让 TweetDownloader 对本地模拟 Likes 服务完整抓取一遍。
+
+每个规模在独立子进程中运行，以便分别统计峰值 RSS::
+
+    python bench_sync.py                          # 1k / 10k / 100k / 500k
+    python bench_sync.py --sizes 1000 5000 --latency 0.02 --output-format jsonl
+
+子进程在临时目录中生成最小的 config.yaml，不会读写真实的站点数据。
+"""
+
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from mock_server import MockLikesServer
+
+ROOT_DIR = Path(__file__).resolve().parent
+
+
+def run_single(likes_url, work_dir, output_format, prefetch_pages):
+    """在子进程内执行一次完整抓取，返回统计结果。"""
+    work_dir = Path(work_dir)
+    (work_dir / "config.yaml").write_text(
+        "\n".join(
+            [
+                f'sites_path: "{work_dir / "sites"}"',
+                'site_name: "bench"',
+                'timezone: "UTC"',
+                'user_id: "42"',
+                'header_authorization: "Bearer bench"',
+                'header_cookies: "ct0=bench; auth_token=bench;"',
+                f'likes_url: "{likes_url}"',
+                f'output_format: "{output_format}"',
+                f"prefetch_pages: {prefetch_pages}",
+                "incremental_backup: false",
+                "rate_limit_backoff_base: 0.1",
+            ]
+        ),
+        encoding="utf-8",
+    )
+    os.chdir(work_dir)
+    sys.path.insert(0, str(ROOT_DIR))
+
+    import logging
+
+    from download_tweets import TweetDownloader
+
+    # 控制台只保留警告，避免逐页日志影响计时
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, logging.StreamHandler) and not isinstance(
+            handler, logging.FileHandler
+        ):
+            handler.setLevel(logging.WARNING)
+
+    start = time.perf_counter()
+    tweets = TweetDownloader().retrieve_all_likes()
+    elapsed = time.perf_counter() - start
+    return {
+        "tweets": tweets,
+        "seconds": elapsed,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def bench(sizes, latency, error_rate, rate_limit, window, output_format, prefetch_pages):
+    results = []
+    for likes in sizes:
+        with MockLikesServer(
+            likes=likes,
+            latency=latency,
+            error_rate=error_rate,
+            rate_limit=rate_limit,
+            window=window,
+        ) as server, tempfile.TemporaryDirectory() as work_dir:
+            proc = subprocess.run(
+                [
+                    sys.executable,
+                    __file__,
+                    "--single",
+                    server.url,
+                    work_dir,
+                    output_format,
+                    str(prefetch_pages),
+                ],
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+            result |= {"likes": likes, "pages": server.stats["pages"]}
+            results.append(result)
+            print(
+                f"{likes:>8} likes: {result['seconds']:8.2f}s  "
+                f"{result['pages'] / result['seconds']:8.1f} pages/s  "
+                f"{result['tweets'] / result['seconds']:9.1f} tweets/s  "
+                f"peak RSS {result['peak_rss_mb']:8.1f} MB  "
+                f"({server.stats['errors']} injected errors)",
+                flush=True,
+            )
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    if len(sys.argv) > 1 and sys.argv[1] == "--single":
+        url, work_dir, output_format, prefetch_pages = sys.argv[2:6]
+        print(json.dumps(run_single(url, work_dir, output_format, int(prefetch_pages))))
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description="Benchmark likes sync throughput")
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 500_000]
+    )
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int, default=None)
+    parser.add_argument("--window", type=int, default=60)
+    parser.add_argument("--output-format", choices=["json", "jsonl"], default="json")
+    parser.add_argument("--prefetch-pages", type=int, default=1)
+    parser.add_argument("--json", dest="json_out", help="write results to this file")
+    args = parser.parse_args()
+
+    results = bench(
+        args.sizes,
+        args.latency,
+        args.error_rate,
+        args.rate_limit,
+        args.window,
+        args.output_format,
+        args.prefetch_pages,
+    )
+    if args.json_out:
+        Path(args.json_out).write_text(json.dumps(results, indent=2), encoding="utf-8")
@@ -0,0 +1,80 @@
+"""时间转换基准：对比 time_util 旧的逐格式 strptime 与当前实现的单次调用耗时。
+
+    python bench_time.py                  # 100k 个时间字符串
+    python bench_time.py --count 20000
+
+分别测量 Twitter 格式和 DISPLAY 格式，按建站时的用法（不指定源格式，转换到
+目标时区的 DISPLAY 格式）。"当前（未命中）"先清空转换缓存，"当前（命中）"
+对同一批字符串再转换一遍。计时前会核对新旧实现的结果一致。
+"""
+
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+import time_util
+from time_util import DateTimeFormat, convert_datetime_format, get_tz
+
+
+def convert_before(datetime_str, target_tz):
+    """旧实现：依次尝试每种格式，未匹配的格式各抛出一次 ValueError。"""
+    for fmt in DateTimeFormat:
+        try:
+            dt = datetime.strptime(datetime_str, fmt.value)
+            break
+        except ValueError:
+            pass
+    else:
+        raise ValueError(datetime_str)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=get_tz(time_util.system_tz))
+    return dt.astimezone(get_tz(target_tz)).strftime(DateTimeFormat.DISPLAY.value)
+
+
+def generate_times(count, seed=0):
+    rng = random.Random(seed)
+    start = datetime(2010, 1, 1, tzinfo=timezone.utc)
+    times = [
+        start + timedelta(seconds=rng.randrange(16 * 365 * 86400)) for _ in range(count)
+    ]
+    return {
+        "TWITTER": [t.strftime(DateTimeFormat.TWITTER.value) for t in times],
+        "DISPLAY": [t.strftime(DateTimeFormat.DISPLAY.value) for t in times],
+    }
+
+
+def _per_call_us(func, strings, target_tz):
+    start = time.perf_counter()
+    for s in strings:
+        func(s, target_tz=target_tz)
+    return (time.perf_counter() - start) / len(strings) * 1e6
+
+
+def bench(count, target_tz):
+    for name, strings in generate_times(count).items():
+        for s in strings[:1000]:
+            expected = convert_before(s, target_tz)
+            actual = convert_datetime_format(s, target_tz=target_tz)
+            if expected != actual:
+                raise AssertionError(f"{s}: {expected} != {actual}")
+
+        before = _per_call_us(convert_before, strings, target_tz)
+        time_util._convert_cached.cache_clear()
+        cold = _per_call_us(convert_datetime_format, strings, target_tz)
+        warm = _per_call_us(convert_datetime_format, strings, target_tz)
+        print(
+            f"{name:>8}: 旧 {before:6.2f} us/次  "
+            f"当前（未命中）{cold:6.2f} us/次 ({before / cold:4.1f}x)  "
+            f"当前（命中）{warm:6.2f} us/次 ({before / warm:4.1f}x)",
+            flush=True,
+        )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark time_util conversions")
+    parser.add_argument("--count", type=int, default=100_000)
+    parser.add_argument("--target-tz", default="Asia/Shanghai")
+    args = parser.parse_args()
+    bench(args.count, args.target_tz)
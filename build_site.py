@@ -1,124 +1,411 @@
+import hashlib
 import json
 import math
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
 from pathlib import Path
 from shutil import copy2
 import shutil
 
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from jinja2 import (
+    Environment,
+    FileSystemBytecodeCache,
+    FileSystemLoader,
+    TemplateNotFound,
+    select_autoescape,
+)
 
-from config import config
-from time_util import convert_datetime_format
+from archive_store import ArchiveStore
+from config import account_configs, config
+from search_index import SearchIndexBuilder, page_entries
+from thumbnails import load_thumbnails, pool_context, thumbnail_attrs
+from time_util import convert_datetime_format, format_epoch_ms
+from tweet_record import add_epoch_ms
 
+# 记录每个页面内容哈希的清单，内容未变化的页面不重新生成
+BUILD_MANIFEST_FILENAME = ".build_manifest.json"
+BUILD_MANIFEST_VERSION = 1
+# 模板编译结果的缓存目录，源文件变化时 Jinja 按校验和自动重新编译
+TEMPLATE_CACHE_DIRNAME = ".template_cache"
 
-def build_site():
+
+def build_site(cfg=config):
     ROOT_DIR = Path(__file__).resolve().parent
 
     # tweets_dir = config["site_path"] / "tweets"
     # tweets_dir.mkdir(exist_ok=True)
 
     theme_dir = Path(
-        config.get("theme_dir", "{root_dir}/site_theme").format(root_dir=str(ROOT_DIR))
+        cfg.get("theme_dir", "{root_dir}/site_theme").format(root_dir=str(ROOT_DIR))
     )
     if not theme_dir.exists():
         raise FileNotFoundError(f"Theme directory not found: {theme_dir}")
 
     static_dir = theme_dir / "static"
     if static_dir.exists():
-        shutil.copytree(static_dir, config["site_path"] / "static", dirs_exist_ok=True)
+        shutil.copytree(static_dir, cfg["site_path"] / "static", dirs_exist_ok=True)
+
+    thumbnails = load_thumbnails(cfg)
+    env = _create_env(cfg, theme_dir, thumbnails)
+    _precompile_theme(env)
+
+    store = None
+    if cfg.get("archive_store") == "sqlite":
+        # 按页从数据库读取，不把整个归档载入内存
+        if not cfg["archive_db_path"].exists():
+            raise FileNotFoundError(f"Archive database not found: {cfg['archive_db_path']}")
+        store = ArchiveStore(cfg["archive_db_path"])
+        tweet_count = store.count()
+    else:
+        input_json_path = cfg["merged_json_path"]
+        if not input_json_path.exists():
+            raise FileNotFoundError(f"Input JSON not found: {input_json_path}")
+
+        tweets_data = json.loads(input_json_path.read_text(encoding="utf-8"))
+        if isinstance(tweets_data, dict) and "tweets" in tweets_data:
+            tweets = tweets_data["tweets"]
+        else:
+            tweets = tweets_data
+        tweet_count = len(tweets)
+
+    tpl = env.get_template("tweets.html")
+
+    items_per_page = cfg.get("items_per_page") or tweet_count
+
+    layout = _page_layout(cfg, tweet_count, items_per_page)
+    first_page_size = layout[0]["size"]
+    if store is not None:
+        pages = store.iter_pages(items_per_page, first_page_size)
+    else:
+        starts = [0, *range(first_page_size, tweet_count, items_per_page)]
+        pages = (tweets[start : start + page["size"]] for start, page in zip(starts, layout))
+
+    site_path = cfg["site_path"]
+    manifest_path = site_path / BUILD_MANIFEST_FILENAME
+    old_hashes = _read_build_manifest(manifest_path)
+    fingerprint = _theme_fingerprint(cfg, theme_dir)
+    new_hashes = {}
+    written = 0
+    search = SearchIndexBuilder(cfg) if cfg.get("enable_search", True) else None
+    workers = cfg.get("render_workers", 1) or os.cpu_count()
+    executor = None
+    builder = None
+    if workers > 1 and len(layout) > 1:
+        # 每个工作进程创建自己的 Environment；页面的哈希、渲染与搜索字段
+        # 都在工作进程中完成，主进程只负责分页与汇总结果
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=pool_context(),
+            initializer=_init_render_worker,
+            initargs=(cfg, theme_dir, fingerprint, search is not None),
+        )
+    else:
+        builder = _PageBuilder(cfg, tpl, thumbnails, fingerprint, search is not None)
+    # 按页序取回结果，搜索索引中推文的顺序与页面一致
+    pending = deque()
+    try:
+        for page in layout:
+            context = {
+                "title": "Liked Tweets Export",
+                "base_path": "",
+                "search_url": "search.html" if search is not None else None,
+                **page["context"],
+            }
+            filename = page["filename"]
+            args = (filename, next(pages, []), context, old_hashes.get(filename))
+            if executor is None:
+                future = Future()
+                future.set_result(builder(*args))
+            else:
+                future = executor.submit(_build_worker_page, *args)
+            pending.append((filename, future))
+            while len(pending) > (workers * 2 if executor is not None else 0):
+                written += _finish_page(pending.popleft(), new_hashes, search)
+        while pending:
+            written += _finish_page(pending.popleft(), new_hashes, search)
+        if search is not None:
+            search.write(executor.map if executor is not None else map)
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        if store is not None:
+            store.close()
+
+    # 删除上次生成、本次已不存在的页面
+    for filename in old_hashes.keys() - new_hashes.keys():
+        (site_path / filename).unlink(missing_ok=True)
+    tmp_path = manifest_path.with_name(f"{manifest_path.name}.tmp")
+    tmp_path.write_text(
+        json.dumps({"version": BUILD_MANIFEST_VERSION, "pages": new_hashes}, indent=2),
+        encoding="utf-8",
+    )
+    tmp_path.replace(manifest_path)
 
+    if search is not None:
+        _write_search_page(env, site_path)
+
+    index_path = cfg["site_path"] / cfg["index_page_filename"]
+    print(
+        f"喜欢页面已生成，共 {len(layout)} 页（重新生成 {written} 页）；"
+        f"首页：{index_path.resolve()}"
+    )
+
+
+def _create_env(cfg, theme_dir, thumbnails):
+    cache_dir = Path(cfg["site_path"], TEMPLATE_CACHE_DIRNAME)
+    cache_dir.mkdir(exist_ok=True)
     env = Environment(
         loader=FileSystemLoader(str(theme_dir)),
         autoescape=select_autoescape(["html", "xml"]),
         trim_blocks=True,
         lstrip_blocks=True,
+        bytecode_cache=FileSystemBytecodeCache(str(cache_dir)),
+        # 一次生成过程中主题不会变化，不必每次取模板都检查文件修改时间
+        auto_reload=False,
+    )
+    # 时间以毫秒时间戳存储，渲染到页面时才按配置时区格式化
+    env.filters["localtime"] = lambda epoch_ms: (
+        "" if epoch_ms is None else format_epoch_ms(epoch_ms, cfg["timezone"])
+    )
+    # 有缩略图时返回 {"src", "srcset"}，否则为 None，模板退回原图
+    env.filters["thumbnail"] = lambda filename, base_path="": thumbnail_attrs(
+        thumbnails.get(filename), filename, base_path
     )
+    return env
 
-    input_json_path = config["merged_json_path"]
-    if not input_json_path.exists():
-        raise FileNotFoundError(f"Input JSON not found: {input_json_path}")
 
-    tweets_data = json.loads(input_json_path.read_text(encoding="utf-8"))
-    if isinstance(tweets_data, dict) and "tweets" in tweets_data:
-        tweets = tweets_data["tweets"]
-    else:
-        tweets = tweets_data
+def _precompile_theme(env):
+    """编译主题中的全部模板并写入字节码缓存，渲染进程直接从缓存载入。"""
+    for name in env.list_templates(
+        filter_func=lambda name: name.endswith(".html") and not name.startswith("static/")
+    ):
+        env.get_template(name)
 
-    tweets = [_adjust_times(t) for t in tweets]
 
-    tpl = env.get_template("tweets.html")
+def _write_page(tpl, out_path, page_tweets, context):
+    # 先写临时文件再替换，中断时不会留下不完整的页面
+    tmp_path = out_path.with_name(f"{out_path.name}.tmp")
+    tmp_path.write_text(tpl.render(tweets=page_tweets, **context), encoding="utf-8")
+    tmp_path.replace(out_path)
+
+
+class _PageBuilder:
+    """计算页面哈希，重新生成内容有变化的页面，并取出搜索索引所需的字段。"""
+
+    def __init__(self, cfg, tpl, thumbnails, fingerprint, with_search):
+        self.site_path = cfg["site_path"]
+        self.timezone = cfg["timezone"]
+        self.tpl = tpl
+        self.thumbnails = thumbnails
+        self.fingerprint = fingerprint
+        self.with_search = with_search
+
+    def __call__(self, filename, page_tweets, context, old_hash):
+        """返回 (页面哈希, 是否重新生成, 搜索字段或 None)。"""
+        for t in page_tweets:
+            add_epoch_ms(t)
+        payload = _page_payload(context, page_tweets, self.thumbnails)
+        page_hash = hashlib.sha256((self.fingerprint + payload).encode("utf-8")).hexdigest()
+        out_path = self.site_path / filename
+        written = old_hash != page_hash or not out_path.exists()
+        if written:
+            for t in page_tweets:
+                _localize_times(t, self.timezone)
+            _write_page(self.tpl, out_path, page_tweets, context)
+        entries = page_entries(filename, page_tweets) if self.with_search else None
+        return page_hash, written, entries
+
+
+def _localize_times(tweet, timezone):
+    """把推文（含嵌套推文）的时间字符串转换为配置的时区，供主题直接显示。
 
-    items_per_page = config.get("items_per_page") or len(tweets)
+    在计算页面哈希之后转换，哈希只取决于存储的数据与主题指纹（含时区）。
+    """
+    for t in _walk(tweet):
+        for key in ("tweet_created_at", "updated_at", "tombstone_updated_at"):
+            epoch_ms = t.get(f"{key}_ms")
+            if epoch_ms is not None:
+                t[key] = format_epoch_ms(epoch_ms, timezone)
+            elif t.get(key):
+                t[key] = convert_datetime_format(t[key], target_tz=timezone)
 
-    total_pages = max(1, math.ceil(len(tweets) / items_per_page))
 
-    site_path = config["site_path"]
-    html_files = [p for p in site_path.glob("*.html")]
-    backups, generated_paths, success = [], [], False
+def _finish_page(item, new_hashes, search):
+    filename, future = item
+    page_hash, written, entries = future.result()
+    new_hashes[filename] = page_hash
+    if search is not None:
+        search.add_page(filename, entries, page_hash)
+    return written
+
+
+_worker_builder = None
+
+
+def _init_render_worker(cfg, theme_dir, fingerprint, with_search):
+    global _worker_builder
+    thumbnails = load_thumbnails(cfg)
+    tpl = _create_env(cfg, theme_dir, thumbnails).get_template("tweets.html")
+    _worker_builder = _PageBuilder(cfg, tpl, thumbnails, fingerprint, with_search)
+
+
+def _build_worker_page(filename, page_tweets, context, old_hash):
+    return _worker_builder(filename, page_tweets, context, old_hash)
+
+
+def _write_search_page(env, site_path):
     try:
-        for f in html_files:
-            b = f.with_name(f"{f.stem}.old{f.suffix}")
-            f.replace(b)
-            backups.append((f, b))
-
-        for page in range(1, total_pages + 1):
-            start = (page - 1) * items_per_page
-            end = start + items_per_page
-            page_tweets = tweets[start:end]
+        tpl = env.get_template("search.html")
+    except TemplateNotFound:
+        # 自定义主题没有搜索页模板时只生成索引
+        print("主题中没有 search.html，未生成搜索页")
+        return
+    _write_page(tpl, site_path / "search.html", [], {"title": "Search", "base_path": ""})
+
+
+def _page_layout(cfg, tweet_count, items_per_page):
+    """返回各页的 {"filename", "size", "context"}，按从新到旧的顺序排列。"""
+    if cfg.get("stable_pagination"):
+        return _stable_page_layout(cfg, tweet_count, items_per_page)
+
+    total_pages = max(1, math.ceil(tweet_count / items_per_page))
+    # 各页共用同一份页码链接列表
+    page_links = [
+        {"num": p, "url": _page_filename(cfg, p)} for p in range(1, total_pages + 1)
+    ]
+    layout = []
+    for page in range(1, total_pages + 1):
+        context = {}
+        if total_pages > 1:
+            prev_url = _page_filename(cfg, page - 1) if page > 1 else None
+            next_url = _page_filename(cfg, page + 1) if page < total_pages else None
             context = {
-                "title": "Liked Tweets Export",
-                "base_path": "",
-                "tweets": page_tweets,
+                "page_num": page,
+                "total_pages": total_pages,
+                "prev_url": prev_url,
+                "next_url": next_url,
+                "page_links": page_links,
             }
-            if total_pages > 1:
-                prev_url = _page_filename(page - 1) if page > 1 else None
-                next_url = _page_filename(page + 1) if page < total_pages else None
-                page_links = [
-                    {"num": p, "url": _page_filename(p)}
-                    for p in range(1, total_pages + 1)
-                ]
-                context |= {
-                    "page_num": page,
-                    "total_pages": total_pages,
-                    "prev_url": prev_url,
-                    "next_url": next_url,
-                    "page_links": page_links,
-                }
-            out_path = site_path / _page_filename(page)
-            out_path.write_text(tpl.render(**context), encoding="utf-8")
-            generated_paths.append(out_path)
-
-        if len(generated_paths) != total_pages:
-            raise RuntimeError("incomplete generation")
-        success = True
-    finally:
-        if success:
-            for _, b in backups:
-                b.unlink(missing_ok=True)
+        layout.append(
+            {
+                "filename": _page_filename(cfg, page),
+                "size": items_per_page,
+                "context": context,
+            }
+        )
+    return layout
+
+
+def _stable_page_layout(cfg, tweet_count, items_per_page):
+    """从最旧的一端分页：第 1 页为最旧的 items_per_page 条，首页只放剩余的最新推文。
 
-    index_path = config["site_path"] / config["index_page_filename"]
-    print(f"喜欢页面已生成，共 {total_pages} 页；首页：{index_path.resolve()}")
+    新的点赞只改变首页；首页攒满一页后才新增一个编号页，并只改动前一个编号页的
+    “较新”链接，更早的页面不再变化。
+    """
+    full_pages = (tweet_count - 1) // items_per_page if tweet_count else 0
+    index_filename = cfg["index_page_filename"]
 
+    def filename(num):
+        return index_filename if num > full_pages else f"{index_filename}-page-{num}.html"
 
-def _page_filename(page_number: int) -> str:
+    head = full_pages + 1
+    layout = [
+        {
+            "filename": index_filename,
+            "size": tweet_count - full_pages * items_per_page,
+            "context": {
+                "page_num": head,
+                "prev_url": None,
+                "next_url": filename(full_pages) if full_pages else None,
+                "page_links": [
+                    {"num": p, "url": filename(p)} for p in range(head, 0, -1)
+                ],
+            }
+            if full_pages
+            else {},
+        }
+    ]
+    for num in range(full_pages, 0, -1):
+        layout.append(
+            {
+                "filename": filename(num),
+                "size": items_per_page,
+                "context": {
+                    "page_num": num,
+                    "latest_url": index_filename,
+                    "prev_url": filename(num + 1),
+                    "next_url": filename(num - 1) if num > 1 else None,
+                    # 只列出更早的页面，页面内容与之后新增的页数无关
+                    "page_links": [
+                        {"num": p, "url": filename(p)}
+                        for p in range(num, max(0, num - 5), -1)
+                    ],
+                },
+            }
+        )
+    return layout
+
+
+def _theme_fingerprint(cfg, theme_dir):
+    """主题文件与影响渲染结果的配置的哈希。"""
+    digest = hashlib.sha256()
+    for path in sorted(theme_dir.rglob("*")):
+        if path.is_file():
+            digest.update(str(path.relative_to(theme_dir)).encode("utf-8"))
+            digest.update(path.read_bytes())
+    digest.update(str(cfg.get("timezone")).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _page_payload(context, page_tweets, thumbnails):
+    """页面渲染所需数据的 JSON 文本：分页信息、推文数据及其用到的缩略图。
+
+    与主题指纹一起计算页面哈希。
+    """
+    filenames = sorted(
+        {
+            item["filename"]
+            for tweet in page_tweets
+            for t in _walk(tweet)
+            for item in [t.get("avatar") or {}, *(t.get("tweet_media") or [])]
+            if item.get("filename")
+        }
+    )
+    payload = {
+        "context": context,
+        "tweets": page_tweets,
+        "thumbnails": [thumbnails.get(name) for name in filenames],
+    }
+    return json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+
+
+def _walk(tweet):
+    yield tweet
+    for key in ("quoted_tweet", "retweeted_tweet", "in_reply_to_tweet"):
+        if nested := tweet.get(key):
+            yield from _walk(nested)
+
+
+def _read_build_manifest(manifest_path):
+    try:
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if manifest.get("version") != BUILD_MANIFEST_VERSION:
+        return {}
+    return manifest.get("pages", {})
+
+
+def _page_filename(cfg, page_number: int) -> str:
     # Page 1 uses the configured index filename; others use index_page_filename-page-{n}.html
     return (
-        config["index_page_filename"]
+        cfg["index_page_filename"]
         if page_number == 1
-        else f"{config["index_page_filename"]}-page-{page_number}.html"
+        else f"{cfg["index_page_filename"]}-page-{page_number}.html"
     )
 
 
-def _adjust_times(tweet):
-    quote = tweet.get("quoted_tweet") or tweet.get("retweeted_tweet")
-    for t in [tweet, quote]:
-        for time_key in ("tweet_created_at", "updated_at", "tombstone_updated_at"):
-            if t and time_key in t:
-                t[time_key] = convert_datetime_format(
-                    t[time_key],
-                    target_tz=config["timezone"],
-                )
-    return tweet
-
-
 if __name__ == "__main__":
-    build_site()
+    for account_cfg in account_configs():
+        build_site(account_cfg)
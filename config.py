@@ -12,18 +12,34 @@ with open("config.yaml", encoding="utf-8") as config_file:
 
 config.setdefault("user_id", "")
 
-config["site_path"] = Path(
-    config.get("sites_path", "sites"), config.get("site_name", "liked_tweets")
-)
-config["site_path"].mkdir(parents=True, exist_ok=True)
 
-config["output_json_path"] = config["site_path"] / config.get(
-    "output_json_filename", "liked_tweets.json"
-)
+def _resolve_paths(cfg):
+    """根据站点名推导各输出文件路径。"""
+    cfg["site_path"] = Path(
+        cfg.get("sites_path", "sites"), cfg.get("site_name", "liked_tweets")
+    )
+    cfg["site_path"].mkdir(parents=True, exist_ok=True)
+
+    cfg["output_json_path"] = cfg["site_path"] / cfg.get(
+        "output_json_filename", "liked_tweets.json"
+    )
+
+    cfg["merged_json_path"] = (
+        cfg["site_path"] / f"{cfg["output_json_path"].stem}_merged.json"
+    )
 
-config["merged_json_path"] = (
-    config["site_path"] / f"{config["output_json_path"].stem}_merged.json"
-)
+    cfg["known_ids_path"] = cfg["merged_json_path"].with_suffix(".ids")
+    cfg["archive_db_path"] = cfg["merged_json_path"].with_suffix(".sqlite3")
+    if cfg.get("archive_store") == "sqlite":
+        # 两种存储各自记录已合并的文件，切换存储方式后会完整合并一次
+        db_path = cfg["archive_db_path"]
+        cfg["merge_manifest_path"] = db_path.with_name(f"{db_path.name}.manifest")
+    else:
+        cfg["merge_manifest_path"] = cfg["merged_json_path"].with_suffix(".manifest")
+    return cfg
+
+
+_resolve_paths(config)
 
 config["log_path"] = Path(config["site_path"], config.get("log", "liked_tweets.log"))
 
@@ -31,6 +47,23 @@ config.setdefault("enable_media_download", True)
 config.setdefault("items_per_page", 500)
 
 
+def account_configs():
+    """返回每个账号的配置。
+
+    ``accounts`` 中每一项覆盖顶层的同名设置（user_id、header_cookies、
+    site_name 等），未配置 accounts 时只有顶层配置本身。
+    """
+    if not config.get("accounts"):
+        return [config]
+    cfgs = []
+    for account in config["accounts"]:
+        cfg = {k: v for k, v in config.items() if k != "accounts"}
+        cfg["site_name"] = f"{cfg.get('site_name', 'liked_tweets')}_{account['user_id']}"
+        cfg.update(account)
+        cfgs.append(_resolve_paths(cfg))
+    return cfgs
+
+
 dict_config = {
     "version": 1,
     "disable_existing_loggers": False,
@@ -0,0 +1,192 @@
+"""回复与引用上下文扩展。
+
+收集归档中被引用但缺失的推文（回复的父推文、墓碑引用），通过
+TweetResultsByRestIds 接口批量获取，结果按推文 ID 持久化到 SQLite 缓存，
+每个 ID 跨多次运行只请求一次（接口未返回的推文也会记录，不再重试）。
+请求出错时只记录日志并使用已缓存的结果，该批推文下次运行时再请求。
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+
+import httpx as requests
+
+from time_util import strfnow
+from tweet_record import TweetRecord
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_TWEETS_BY_IDS_URL = (
+    "https://x.com/i/api/graphql/Xl5pC_lBk_gcO2ItU39DQw/TweetResultsByRestIds"
+)
+
+
+class ContextCache:
+    """推文 ID -> 推文 JSON 的持久缓存；值为 None 表示已确认无法获取。"""
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS context ("
+            "tweet_id TEXT PRIMARY KEY, tweet TEXT, fetched_at TEXT)"
+        )
+        self._conn.commit()
+
+    def get_many(self, tweet_ids):
+        """返回已缓存的 {推文 ID: 推文或 None}。"""
+        found = {}
+        tweet_ids = list(tweet_ids)
+        with self._lock:
+            for i in range(0, len(tweet_ids), 500):
+                chunk = tweet_ids[i : i + 500]
+                rows = self._conn.execute(
+                    "SELECT tweet_id, tweet FROM context WHERE tweet_id IN "
+                    f"({','.join('?' * len(chunk))})",
+                    chunk,
+                )
+                for tweet_id, tweet in rows:
+                    found[tweet_id] = json.loads(tweet) if tweet else None
+        return found
+
+    def put_many(self, tweets):
+        fetched_at = strfnow("UTC")
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO context VALUES (?, ?, ?)",
+                [
+                    (
+                        tweet_id,
+                        json.dumps(tweet, ensure_ascii=False) if tweet else None,
+                        fetched_at,
+                    )
+                    for tweet_id, tweet in tweets.items()
+                ],
+            )
+
+    def close(self):
+        self._conn.close()
+
+
+class ContextExpander:
+    def __init__(self, cfg, downloader=None):
+        """downloader 为 None 时只使用缓存，不发起请求。"""
+        self.config = cfg
+        self.downloader = downloader
+        # TweetResultsByRestIds 的速率限制额度与 Likes 接口分开记账
+        self._client = downloader.rate_limited_client() if downloader else None
+        self.batch_size = cfg.get("context_batch_size", 100)
+        self.url = cfg.get("tweets_by_ids_url", DEFAULT_TWEETS_BY_IDS_URL)
+        self.cache = ContextCache(cfg["site_path"] / "context_cache.sqlite3")
+
+    def close(self):
+        self.cache.close()
+
+    def expand(self, tweets):
+        """为推文补充回复父推文与墓碑引用，原地修改。"""
+        self.attach(tweets, self.lookup(self.collect_missing(tweets)))
+
+    def lookup(self, wanted):
+        """返回 {推文 ID: 推文或 None}，缓存中没有的按批获取。"""
+        cached = self.cache.get_many(wanted)
+        to_fetch = [tweet_id for tweet_id in wanted if tweet_id not in cached]
+        if to_fetch and self.downloader:
+            _logger.info(
+                f"需要获取 {len(to_fetch)} 条上下文推文（已缓存 {len(cached)} 条）"
+            )
+            cached |= self.fetch(to_fetch)
+        return cached
+
+    def collect_missing(self, tweets, archived=None):
+        """archived 为已归档 ID 的集合；流式处理时由调用方提供。"""
+        if archived is None:
+            archived = {t["tweet_id"] for t in tweets}
+        wanted = {}
+        for tweet in tweets:
+            reply_to = tweet.get("in_reply_to_status_id")
+            if reply_to and reply_to not in archived:
+                wanted[reply_to] = None
+            quote = tweet.get("quoted_tweet")
+            if (
+                quote
+                and "tombstone" in quote
+                and "tweet_content" not in quote
+                and quote.get("tweet_id")
+            ):
+                wanted[quote["tweet_id"]] = None
+        return list(wanted)
+
+    def fetch(self, tweet_ids):
+        fetched = {}
+        for i in range(0, len(tweet_ids), self.batch_size):
+            batch = tweet_ids[i : i + self.batch_size]
+            try:
+                results = self._fetch_batch(batch)
+            except (requests.HTTPError, ValueError) as e:
+                # 上下文扩展是可选的，接口失效（如 query ID 过期）时不影响合并；
+                # 失败的批次不写入缓存，下次运行时重试
+                _logger.error(f"获取上下文推文失败，本次只使用已缓存的结果: {e}")
+                break
+            # 每批立即落盘，中断后不会重复请求
+            self.cache.put_many(results)
+            fetched |= results
+            _logger.info(
+                f"上下文推文 {min(i + self.batch_size, len(tweet_ids))}/{len(tweet_ids)}，"
+                f"本批获取 {sum(1 for t in results.values() if t)} 条"
+            )
+        return fetched
+
+    def _fetch_batch(self, batch):
+        variables = {
+            "tweetIds": batch,
+            "includePromotedContent": False,
+            "withBirdwatchNotes": False,
+            "withVoice": False,
+            "withCommunity": False,
+        }
+        response = self._client.get(
+            self.url,
+            params={
+                "variables": json.dumps(variables),
+                "features": json.dumps(self.downloader.likes_request_features_data()),
+            },
+            headers=self.downloader.likes_request_headers(),
+        )
+        response.raise_for_status()
+        raw_results = response.json().get("data", {}).get("tweetResult", [])
+
+        # 接口不保证按请求顺序、逐个 ID 返回结果，按结果自身的 ID 对应；
+        # 没有对应结果的 ID 记为 None
+        results = dict.fromkeys(batch)
+        for item in raw_results:
+            result = (item or {}).get("result")
+            if result and result.get("__typename") == "TweetWithVisibilityResults":
+                result = result.get("tweet")
+            if not result or not result.get("legacy"):
+                continue
+            tweet_id = result.get("rest_id") or result["legacy"].get("id_str")
+            if tweet_id not in results:
+                continue
+            try:
+                results[tweet_id] = TweetRecord.from_key_data(result).as_json()
+            except KeyError:
+                _logger.error(f"上下文推文 {tweet_id} 解析失败")
+        return results
+
+    def attach(self, tweets, cached):
+        for tweet in tweets:
+            self.attach_one(tweet, cached)
+
+    def attach_one(self, tweet, cached):
+        parent = cached.get(tweet.get("in_reply_to_status_id"))
+        if parent:
+            tweet["in_reply_to_tweet"] = parent
+        quote = tweet.get("quoted_tweet")
+        if quote and "tombstone" in quote and "tweet_content" not in quote:
+            full_quote = cached.get(quote.get("tweet_id"))
+            if full_quote:
+                # 与合并时的规则一致：保留墓碑信息，补全引文内容
+                quote |= {**full_quote, "tombstone": quote["tombstone"]}
+        return tweet
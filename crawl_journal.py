@@ -0,0 +1,88 @@
+import json
+import logging
+import os
+from pathlib import Path
+
+_logger = logging.getLogger(__name__)
+
+
+class CrawlJournal:
+    """逐页追加的抓取日志。
+
+    每行一条 JSON 记录：首行为 header，之后每抓完一页追加一条 page 记录
+    （下一页游标 + 本页解析出的推文），抓取结束时追加 complete 记录。
+    每条记录写入后立即 fsync，进程崩溃最多丢失正在处理的那一页。
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._file = None
+
+    def exists(self):
+        return self.path.exists()
+
+    def load(self):
+        """读取已提交的记录，返回 header、最后游标、已抓取推文等信息。"""
+        state = {
+            "header": None,
+            "cursor": None,
+            "pages": 0,
+            "tweets": [],
+            "complete": False,
+        }
+        if not self.path.exists():
+            return state
+
+        committed_size = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 末尾未写完的记录视为未提交
+                    _logger.warning(f"{self.path}: 忽略未完整写入的日志记录")
+                    break
+                committed_size += len(line)
+                record_type = record.get("type")
+                if record_type == "header":
+                    state["header"] = record
+                elif record_type == "page":
+                    state["cursor"] = record["cursor"]
+                    state["pages"] = record["page"]
+                    state["tweets"].extend(record["tweets"])
+                elif record_type == "complete":
+                    state["complete"] = True
+        state["committed_size"] = committed_size
+        return state
+
+    def start(self, **header):
+        self.close()
+        self._file = open(self.path, "w", encoding="utf-8")
+        self._append({"type": "header", **header})
+
+    def reopen(self, committed_size):
+        """截断未提交的尾部后以追加方式继续写入。"""
+        self.close()
+        with open(self.path, "r+b") as f:
+            f.truncate(committed_size)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def append_page(self, page, cursor, tweets):
+        self._append({"type": "page", "page": page, "cursor": cursor, "tweets": tweets})
+
+    def mark_complete(self, cursor):
+        self._append({"type": "complete", "cursor": cursor})
+
+    def discard(self):
+        self.close()
+        self.path.unlink(missing_ok=True)
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def _append(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
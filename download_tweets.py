@@ -1,30 +1,47 @@
+import importlib.util
 import json
 import os
+import queue
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import closing
 from pathlib import Path
 
 import httpx as requests
 
 from build_site import build_site
-from config import config
+from config import account_configs, config
+from context_expander import ContextExpander
+from crawl_journal import CrawlJournal
+from jsonl_backup import JsonlBackupWriter, last_manifest
+from known_ids import KnownIdIndex, load_known_ids
 from merge_and_download import TweetMerger
+from rate_limiter import RateLimitedClient
+from raw_archive import RawPageArchive
 from time_util import *
-from tweet_parser import TweetParser
+from tweet_record import parse_entry
 
 _logger = logging.getLogger(__name__)
 
 
 class TweetDownloader:
-    def __init__(self):
+    def __init__(self, cfg=config, http_client=None):
+        self.config = cfg
         self.backup_time_str = strfnow('UTC')
-        self.header_authorization = config.get('header_authorization')
-        self.header_cookie = config.get('header_cookies', '')
+        self.header_authorization = self.config.get('header_authorization')
+        self.header_cookie = self.config.get('header_cookies', '')
 
         # http client with retries (aligned with merge_and_download)
-        proxy = os.environ.get("http_proxy") or os.environ.get("all_proxy")
-        self._client = requests.Client(
-            transport=requests.HTTPTransport(retries=3), timeout=30, proxy=proxy
-        )
+        # 多账号同步时共用同一个连接池，速率限制额度仍按账号分别计算
+        if http_client is None:
+            proxy = os.environ.get("http_proxy") or os.environ.get("all_proxy")
+            http_client = requests.Client(
+                transport=requests.HTTPTransport(retries=3), timeout=30, proxy=proxy
+            )
+        self.http_client = http_client
+        # 按响应头中的速率限制调度请求，429/5xx 时退避重试
+        self._client = self.rate_limited_client()
 
         # 从 cookie 中提取 CSRF token (ct0)
         csrf_match = re.findall('ct0=(.*?);', self.header_cookie)
@@ -35,98 +52,131 @@ class TweetDownloader:
         self.header_csrf = csrf_match[0]
 
         # 设置默认值
-        self.incremental_backup = config.get("incremental_backup", True)
-        self.max_sync_count = config.get("max_sync_count")
-
-    def retrieve_all_likes(self):
-        new_tweets = []
-        stop_id = None
-        output_file = config["output_json_path"]
-        old_tweets = []
-
-        # 增量备份时读取旧文件并设置stop_id
-        if self.incremental_backup and output_file.exists():
-            with open(output_file, "r", encoding="utf-8") as f:
-                try:
-                    loaded = json.load(f)
-                    if loaded:
-                        old_tweets = loaded["tweets"]
-                        stop_id = old_tweets[0].get("tweet_id")
-                except Exception:
-                    old_tweets = []
-                    stop_id = None
+        self.incremental_backup = self.config.get("incremental_backup", True)
+        self.max_sync_count = self.config.get("max_sync_count")
+        # 备份格式：json 每次重写整个文件；jsonl 逐页追加
+        self.output_format = self.config.get("output_format", "json")
+        # 预取页数：0 关闭流水线，最多提前 2 页
+        self.prefetch_pages = max(0, min(int(self.config.get("prefetch_pages") or 0), 2))
+        # 增量备份时连续遇到多少条已归档推文即停止抓取，0 为关闭
+        self.known_id_stop_count = self.config.get("known_id_stop_count", 20)
+        self.known_ids = KnownIdIndex()
+        self._consecutive_known = 0
+        self.raw_archive = None
 
-        # 非增量备份且文件存在，自动递增文件名
-        if not self.incremental_backup and output_file.exists():
-            parent_dir = output_file.parent
-            name_toks = output_file.stem.split(".")
-            num_tok = (
-                len(name_toks) > 1
-                and name_toks[-1].isnumeric()
-                and name_toks[-1]
-                or None
+    def rate_limited_client(self):
+        """在共用的连接池上新建一份速率限制记账；每个接口的额度分别计算，各用一份。"""
+        return RateLimitedClient(
+            self.http_client,
+            max_retries=self.config.get("rate_limit_max_retries", 5),
+            backoff_base=self.config.get("rate_limit_backoff_base", 2),
+            backoff_max=self.config.get("rate_limit_backoff_max", 300),
+        )
+
+    def retrieve_all_likes(self, resume=False):
+        self._consecutive_known = 0
+        output_file = self.config["output_json_path"]
+        if self.output_format == "jsonl":
+            output_file = output_file.with_suffix(".jsonl")
+        journal = CrawlJournal(
+            self.config["site_path"] / f"{self.config['output_json_path'].stem}.journal"
+        )
+        journal_state = journal.load() if resume else None
+        if journal_state and not journal_state["header"]:
+            journal_state = None
+
+        if journal_state:
+            # 从日志恢复上次中断的抓取
+            header = journal_state["header"]
+            self.backup_time_str = header["backup_time"]
+            output_file = Path(header["output_file"])
+            stop_id = header.get("stop_id")
+            old_tweets = self._load_old_tweets(output_file)
+            _logger.info(
+                f"从抓取日志恢复：已完成 {journal_state['pages']} 页，"
+                f"{len(journal_state['tweets'])} 条推文，游标 {journal_state['cursor']}"
             )
-            next_num = int(num_tok) if num_tok else 0
-            base_name_toks = name_toks[:-1] if num_tok else name_toks
-            while True:
-                next_num += 1
-                new_file = Path(
-                    parent_dir,
-                    ".".join(base_name_toks + [str(next_num)]) + output_file.suffix,
+            journal.reopen(journal_state["committed_size"])
+        else:
+            if resume:
+                _logger.warning(f"未找到可恢复的抓取日志 {journal.path}，重新开始抓取")
+            elif journal.exists():
+                _logger.warning(
+                    f"发现未完成的抓取日志 {journal.path}，将被覆盖；如需继续请使用 --resume"
                 )
-                if not new_file.exists():
-                    output_file = new_file
-                    break
+            output_file = self._next_output_file(output_file)
+            old_tweets = self._load_old_tweets(output_file)
+            stop_id = self._find_stop_id(output_file, old_tweets)
+            journal.start(
+                backup_time=self.backup_time_str,
+                output_file=str(output_file),
+                stop_id=stop_id,
+            )
 
-        likes_page = self.retrieve_likes_page()
-        page_cursor = self.get_cursor(likes_page)
-        old_page_cursor = None
-        current_page = 1
-        synced_count = 0
+        # 按本次备份时间建目录保存原始响应，恢复抓取时沿用同一目录
+        if self.config.get("raw_archive"):
+            self.raw_archive = RawPageArchive(
+                self.config["site_path"]
+                / "raw_pages"
+                / convert_datetime_format(
+                    self.backup_time_str, to_format=DateTimeFormat.FILENAME
+                ),
+                compression=self.config.get("raw_archive_compression", "gzip"),
+            )
 
-        while likes_page and page_cursor and page_cursor != old_page_cursor:
-            _logger.info(
-                f"Fetching likes page: {current_page}, {len(likes_page)} tweets fetched"
+        if self.incremental_backup and self.known_id_stop_count:
+            self.known_ids = load_known_ids(
+                self.config["known_ids_path"], self.config["merged_json_path"]
             )
-            current_page += 1
-            stop = False
-            added_tweets_count = 0
-            for raw_tweet in likes_page:
-                if self.max_sync_count and synced_count >= self.max_sync_count:
-                    stop = True
-                    break
-                try:
-                    tweet_parser = TweetParser(raw_tweet, timezone=config["timezone"])
-                    if tweet_parser.data_type != "tweet":
-                        if tweet_parser.data_type == "unknown_type":
-                            _logger.error(
-                                f"raw_tweet 类型未知：{json.dumps(raw_tweet, ensure_ascii=False, indent=2)}"
-                            )
-                        continue
-                    # 用stop_id判断增量终止
-                    if stop_id and tweet_parser.tweet_id == str(stop_id):
-                        stop = True
-                        break
-                    tweet_json = tweet_parser.tweet_as_json()
-
-                    new_tweets.append(tweet_json)
-                    added_tweets_count += 1
-                    synced_count += 1
-                except KeyError:
-                    _logger.error(
-                        f"raw_tweet json解析失败：{json.dumps(raw_tweet, ensure_ascii=False, indent=2)}"
+            _logger.info(f"已载入 {len(self.known_ids)} 条已归档推文 ID")
+
+        new_tweets = journal_state["tweets"] if journal_state else []
+        page_cursor = journal_state["cursor"] if journal_state else None
+        current_page = journal_state["pages"] if journal_state else 0
+        synced_count = len(new_tweets)
+
+        # JSONL 模式下逐页追加写入，不在内存中累积推文
+        jsonl_writer = None
+        if self.output_format == "jsonl":
+            jsonl_writer = JsonlBackupWriter(output_file).open(self.backup_time_str)
+            jsonl_writer.append_tweets(new_tweets)
+            new_tweets = []
+
+        if not (journal_state and journal_state["complete"]):
+            with closing(self.iter_likes_pages(cursor=page_cursor)) as pages:
+                for likes_page, page_cursor in pages:
+                    current_page += 1
+                    _logger.info(
+                        f"Fetching likes page: {current_page}, {len(likes_page)} tweets fetched, "
+                        f"rate limit budget: {self._client.budget}"
                     )
-            _logger.info(
-                f"Added {added_tweets_count} new tweets, total {synced_count} tweets"
-            )
-            if stop:
-                break
-            old_page_cursor = page_cursor
-            likes_page = self.retrieve_likes_page(cursor=page_cursor)
-            page_cursor = self.get_cursor(likes_page)
+                    page_tweets, stop = self._parse_likes_page(
+                        likes_page, stop_id, synced_count
+                    )
+                    synced_count += len(page_tweets)
+                    if jsonl_writer:
+                        jsonl_writer.append_tweets(page_tweets)
+                    else:
+                        new_tweets.extend(page_tweets)
+                    journal.append_page(current_page, page_cursor, page_tweets)
+                    _logger.info(
+                        f"Added {len(page_tweets)} new tweets, total {synced_count} tweets"
+                    )
+                    if stop:
+                        break
+            journal.mark_complete(page_cursor)
 
         # 只在有新推时写入
-        if new_tweets:
+        if jsonl_writer:
+            if jsonl_writer.segment_count:
+                jsonl_writer.commit(self.backup_time_str, page_cursor=page_cursor)
+                _logger.info(
+                    f"Done. {synced_count} new liked tweets appended to: {output_file}"
+                )
+            else:
+                jsonl_writer.close()
+                _logger.info("No new tweets found")
+        elif new_tweets:
             all_tweets = new_tweets + old_tweets
             backup_data = {
                 "backup_time": self.backup_time_str,
@@ -141,9 +191,156 @@ class TweetDownloader:
             )
         else:
             _logger.info("No new tweets found")
+        # 结果已并入正式输出，日志不再需要
+        journal.discard()
+        return synced_count
+
+    def _parse_likes_page(self, likes_page, stop_id, synced_count):
+        """解析一页点赞条目，返回 (新推文列表, 是否终止抓取)。"""
+        page_tweets = []
+        for raw_tweet in likes_page:
+            if self.max_sync_count and synced_count >= self.max_sync_count:
+                return page_tweets, True
+            try:
+                data_type, record = parse_entry(raw_tweet)
+                if data_type != "tweet":
+                    if data_type == "unknown_type":
+                        _logger.error(
+                            f"raw_tweet 类型未知：{json.dumps(raw_tweet, ensure_ascii=False, indent=2)}"
+                        )
+                    continue
+                # 用stop_id判断增量终止
+                if stop_id and record.tweet_id == str(stop_id):
+                    return page_tweets, True
+                page_tweets.append(record.as_json())
+                synced_count += 1
+                # 已归档的推文照常写入（可能是重新点赞或数据有更新）；
+                # 连续遇到足够多条时视为已追上归档
+                if record.tweet_id in self.known_ids:
+                    self._consecutive_known += 1
+                    if self._consecutive_known >= self.known_id_stop_count:
+                        _logger.info(
+                            f"连续 {self._consecutive_known} 条推文已归档，停止抓取"
+                        )
+                        return page_tweets, True
+                else:
+                    self._consecutive_known = 0
+            except KeyError:
+                _logger.error(
+                    f"raw_tweet json解析失败：{json.dumps(raw_tweet, ensure_ascii=False, indent=2)}"
+                )
+        return page_tweets, False
+
+    def _find_stop_id(self, output_file, old_tweets):
+        """增量备份时以已备份的最新一条推文为stop_id。"""
+        if not self.incremental_backup:
+            return None
+        if self.output_format == "jsonl":
+            manifest = last_manifest(output_file)
+            return manifest and manifest.get("head_tweet_id")
+        return old_tweets[0].get("tweet_id") if old_tweets else None
+
+    def _load_old_tweets(self, output_file):
+        # 仅增量备份时需要保留旧文件中的推文；JSONL 文件直接追加，无需读取
+        if self.output_format == "jsonl":
+            return []
+        if not (self.incremental_backup and output_file.exists()):
+            return []
+        with open(output_file, "r", encoding="utf-8") as f:
+            try:
+                loaded = json.load(f)
+                if loaded:
+                    return loaded["tweets"]
+            except Exception:
+                pass
+        return []
+
+    def _next_output_file(self, output_file):
+        # 非增量备份且文件存在，自动递增文件名
+        if self.incremental_backup or not output_file.exists():
+            return output_file
+        parent_dir = output_file.parent
+        name_toks = output_file.stem.split(".")
+        num_tok = (
+            len(name_toks) > 1
+            and name_toks[-1].isnumeric()
+            and name_toks[-1]
+            or None
+        )
+        next_num = int(num_tok) if num_tok else 0
+        base_name_toks = name_toks[:-1] if num_tok else name_toks
+        while True:
+            next_num += 1
+            new_file = Path(
+                parent_dir,
+                ".".join(base_name_toks + [str(next_num)]) + output_file.suffix,
+            )
+            if not new_file.exists():
+                return new_file
+
+    def iter_likes_pages(self, cursor=None):
+        """依次产出 (likes_page, page_cursor)，直到游标不再变化。
+
+        开启预取时，后台线程会在当前页解析期间提前请求后续页面，
+        提前量不超过 ``prefetch_pages`` 页；关闭生成器即停止预取。
+        """
+        if self.prefetch_pages:
+            return self._iter_likes_pages_prefetch(cursor)
+        return self._iter_likes_pages_serial(cursor)
+
+    def _iter_likes_pages_serial(self, cursor=None):
+        old_page_cursor = cursor
+        likes_page = self.retrieve_likes_page(cursor=cursor)
+        page_cursor = self.get_cursor(likes_page) if likes_page else None
+
+        while likes_page and page_cursor and page_cursor != old_page_cursor:
+            yield likes_page, page_cursor
+            old_page_cursor = page_cursor
+            likes_page = self.retrieve_likes_page(cursor=page_cursor)
+            page_cursor = self.get_cursor(likes_page) if likes_page else None
+
+    def _iter_likes_pages_prefetch(self, cursor=None):
+        end_of_pages = object()
+        pages = queue.Queue()
+        # 每个槽位对应一页已请求但尚未被取走的页面
+        slots = threading.Semaphore(self.prefetch_pages)
+        stop_event = threading.Event()
+
+        def acquire_slot():
+            while not stop_event.is_set():
+                if slots.acquire(timeout=0.5):
+                    return True
+            return False
+
+        def produce():
+            serial_pages = self._iter_likes_pages_serial(cursor)
+            try:
+                while acquire_slot():
+                    item = next(serial_pages, end_of_pages)
+                    pages.put(item)
+                    if item is end_of_pages:
+                        return
+            except Exception as e:
+                pages.put(e)
+            finally:
+                serial_pages.close()
+
+        worker = threading.Thread(target=produce, name="likes-prefetch", daemon=True)
+        worker.start()
+        try:
+            while (item := pages.get()) is not end_of_pages:
+                if isinstance(item, Exception):
+                    raise item
+                slots.release()
+                yield item
+        finally:
+            stop_event.set()
+            worker.join()
 
     def retrieve_likes_page(self, cursor=None):
-        likes_url = 'https://api.x.com/graphql/PW3fGqNrX-KazLPuqYA8lg/Likes'
+        likes_url = self.config.get(
+            "likes_url", 'https://api.x.com/graphql/PW3fGqNrX-KazLPuqYA8lg/Likes'
+        )
         # likes_url = 'https://x.com/i/api/graphql/-ejCGuXo_HSdL8fBSPGSkA/Likes'
         variables_data_encoded = json.dumps(
             self.likes_request_variables_data(cursor=cursor)
@@ -159,9 +356,17 @@ class TweetDownloader:
             params=params,
             headers=headers,
         )
-        return self.extract_likes_entries(response.json())
+        response.raise_for_status()
+        raw_data = response.json()
+        if "data" not in raw_data and raw_data.get("errors"):
+            messages = "; ".join(e.get("message", "") for e in raw_data["errors"])
+            raise RuntimeError(f"Likes 接口返回错误：{messages}")
+        if self.raw_archive:
+            self.raw_archive.save(cursor, raw_data, strfnow("UTC"))
+        return self.extract_likes_entries(raw_data)
 
-    def extract_likes_entries(self, raw_data):
+    @staticmethod
+    def extract_likes_entries(raw_data):
         return raw_data['data']['user']['result']['timeline']['timeline'][
             'instructions'
         ][0]['entries']
@@ -174,7 +379,7 @@ class TweetDownloader:
 
     def likes_request_variables_data(self, cursor=None):
         variables_data = {
-            "userId": config["user_id"],
+            "userId": self.config["user_id"],
             "count": 100,
             "cursor": cursor,
             "includePromotedContent": False,
@@ -303,8 +508,78 @@ class TweetDownloader:
         # }
 
 
+def sync_account(cfg, http_client=None, resume=False):
+    """抓取、合并并生成单个账号的站点。"""
+    _logger.info(f'Starting retrieval of likes for Twitter user {cfg["user_id"]}...')
+    downloader = TweetDownloader(cfg, http_client)
+    downloader.retrieve_all_likes(resume=resume)
+    expander = (
+        ContextExpander(cfg, downloader)
+        if cfg.get("enable_context_expansion")
+        else None
+    )
+    try:
+        TweetMerger(cfg).merge_and_save(expander)
+    finally:
+        if expander:
+            expander.close()
+    build_site(cfg)
+
+
+def sync_accounts(accounts, resume=False):
+    """并发同步多个账号，共用一个保持连接的连接池（可用时启用 HTTP/2）。
+
+    每个账号抓取完成后立即在各自线程中合并并生成站点；其中用到的进程池
+    不以 fork 方式启动（见 thumbnails.pool_context）。
+    """
+    proxy = os.environ.get("http_proxy") or os.environ.get("all_proxy")
+    http2 = importlib.util.find_spec("h2") is not None
+    http_client = requests.Client(
+        transport=requests.HTTPTransport(
+            retries=3,
+            http2=http2,
+            limits=requests.Limits(
+                max_connections=max(10, len(accounts) * 2),
+                max_keepalive_connections=len(accounts) * 2,
+            ),
+        ),
+        timeout=30,
+        proxy=proxy,
+    )
+    _logger.info(f"并发同步 {len(accounts)} 个账号（HTTP/2: {http2}）")
+    failed = []
+    with http_client, ThreadPoolExecutor(
+        max_workers=len(accounts), thread_name_prefix="account"
+    ) as executor:
+        futures = {
+            executor.submit(sync_account, cfg, http_client, resume): cfg
+            for cfg in accounts
+        }
+        for future in as_completed(futures):
+            cfg = futures[future]
+            try:
+                future.result()
+                _logger.info(f"账号 {cfg['user_id']} ({cfg['site_name']}) 同步完成")
+            except Exception:
+                _logger.exception(f"账号 {cfg['user_id']} ({cfg['site_name']}) 同步失败")
+                failed.append(cfg)
+    if failed:
+        raise RuntimeError(f"{len(failed)} 个账号同步失败")
+
+
 if __name__ == '__main__':
-    _logger.info(f'Starting retrieval of likes for Twitter user {config["user_id"]}...')
-    TweetDownloader().retrieve_all_likes()
-    TweetMerger().merge_and_save()
-    build_site()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Download liked tweets")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="resume an interrupted crawl from its journal",
+    )
+    args = parser.parse_args()
+
+    accounts = account_configs()
+    if len(accounts) == 1:
+        sync_account(accounts[0], resume=args.resume)
+    else:
+        sync_accounts(accounts, resume=args.resume)
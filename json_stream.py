@@ -0,0 +1,155 @@
+"""增量 JSON 读取：逐条产出大文件中某个数组的元素，而不把整个文件载入内存。
+
+备份文件的结构为 ``{"backup_time": ..., "tweets": [{...}, {...}]}``（也兼容
+顶层直接是数组的旧格式）。``iter_events`` 按文件顺序产出顶层事件：
+
+- ``("meta", 键, 值)``：顶层的其他键值对；
+- ``("item", 元素)``：目标数组中的一个元素。
+
+每个元素用 ``json.JSONDecoder.raw_decode`` 从滑动缓冲区中解析，
+内存占用只与单个元素的大小有关。
+"""
+
+import json
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+
+class _Reader:
+    def __init__(self, f, chunk_size):
+        self._f = f
+        self._chunk_size = chunk_size
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self):
+        if self._eof:
+            return False
+        chunk = self._f.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        # 丢弃已消费的部分，缓冲区只保留未解析的数据
+        self._buf = self._buf[self._pos :] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self):
+        """跳过空白，返回下一个字符；文件结束时返回空串。"""
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(
+                f"JSON 格式错误：期望 {char!r}，实际为 {self.peek()!r}"
+            )
+        self._pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # 数字可能恰好在缓冲区末尾被截断，需确认后面还有内容
+            if end == len(self._buf) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+
+def iter_events(path, array_key="tweets", chunk_size=1 << 20):
+    with open(path, "r", encoding="utf-8") as f:
+        reader = _Reader(f, chunk_size)
+        if reader.peek() == "[":
+            yield from _iter_array(reader)
+            return
+        reader.expect("{")
+        if reader.peek() == "}":
+            return
+        while True:
+            key = reader.value()
+            reader.expect(":")
+            if key == array_key and reader.peek() == "[":
+                yield from _iter_array(reader)
+            else:
+                yield "meta", key, reader.value()
+            if reader.peek() == ",":
+                reader.expect(",")
+                continue
+            reader.expect("}")
+            return
+
+
+def _iter_array(reader):
+    reader.expect("[")
+    if reader.peek() == "]":
+        reader.expect("]")
+        return
+    while True:
+        yield "item", reader.value()
+        if reader.peek() == ",":
+            reader.expect(",")
+            continue
+        reader.expect("]")
+        return
+
+
+def read_meta(path, array_key="tweets"):
+    """读取顶层除数组以外的键值对（数组元素被逐个跳过）。"""
+    return {
+        event[1]: event[2]
+        for event in iter_events(path, array_key)
+        if event[0] == "meta"
+    }
+
+
+def iter_items(path, array_key="tweets"):
+    for event in iter_events(path, array_key):
+        if event[0] == "item":
+            yield event[1]
+
+
+if __name__ == "__main__":
+    # 自检：与 json.load 的结果逐条比较，包括极小的缓冲区
+    import sys
+    import tempfile
+
+    samples = [
+        {"backup_time": "2025-01-01 00:00:00 +0000", "tweets": [{"a": 1}, {"b": [1, 2.5, "三"]}]},
+        {"tweets": [], "backup_time": None},
+        {"tweets": [{"x": 12345678901234567890}], "tweet_count": 1, "trailing": {"k": "v"}},
+        [{"a": "list format"}, 7, "s", None],
+        {},
+    ]
+    for sample in samples:
+        for indent in (None, 2):
+            with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+                json.dump(sample, f, ensure_ascii=False, indent=indent)
+            for chunk_size in (1, 3, 64, 1 << 20):
+                events = list(iter_events(f.name, chunk_size=chunk_size))
+                items = [e[1] for e in events if e[0] == "item"]
+                meta = {e[1]: e[2] for e in events if e[0] == "meta"}
+                if isinstance(sample, list):
+                    assert items == sample and not meta
+                else:
+                    assert items == sample.get("tweets", [])
+                    assert meta == {k: v for k, v in sample.items() if k != "tweets"}
+    for path in sys.argv[1:]:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        tweets = data["tweets"] if isinstance(data, dict) else data
+        assert list(iter_items(path)) == tweets, path
+        print(f"{path}: {len(tweets)} 条一致")
+    print("json_stream 自检通过")
@@ -0,0 +1,150 @@
+"""JSON Lines 备份格式。
+
+文件首行是 header，之后每次备份追加一段推文记录（每行一条，新的在前），
+并以一条 manifest 记录结束该段：
+
+    {"type": "header", "format": "liked_tweets-jsonl", "version": 1, ...}
+    {"tweet_id": "3", ...}
+    {"tweet_id": "2", ...}
+    {"type": "manifest", "backup_time": "...", "tweet_count": 2, "head_tweet_id": "3", ...}
+    {"tweet_id": "5", ...}
+    {"type": "manifest", ...}
+
+最后一条 manifest 之后的行属于未提交的段（例如抓取中途崩溃），
+读取时忽略，下次写入前截断。整体时间顺序为：越靠后的段越新。
+"""
+
+import json
+import logging
+import os
+from pathlib import Path
+
+_logger = logging.getLogger(__name__)
+
+FORMAT_NAME = "liked_tweets-jsonl"
+FORMAT_VERSION = 1
+
+
+class JsonlBackupWriter:
+    def __init__(self, path):
+        self.path = Path(path)
+        self._file = None
+        self._segment_count = 0
+        self._head_tweet_id = None
+
+    def open(self, created_at=None):
+        """打开文件准备追加一个新段；丢弃上次未提交的尾部。"""
+        if self.path.exists():
+            committed_end = scan_segments(self.path)[1]
+            with open(self.path, "r+b") as f:
+                if f.seek(0, os.SEEK_END) != committed_end:
+                    _logger.warning(f"{self.path}: 丢弃未提交的记录")
+                    f.truncate(committed_end)
+            self._file = open(self.path, "a", encoding="utf-8")
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "w", encoding="utf-8")
+            self._write(
+                {
+                    "type": "header",
+                    "format": FORMAT_NAME,
+                    "version": FORMAT_VERSION,
+                    "created_at": created_at,
+                }
+            )
+        self._segment_count = 0
+        self._head_tweet_id = None
+        return self
+
+    def append_tweets(self, tweets):
+        for tweet in tweets:
+            if self._head_tweet_id is None:
+                self._head_tweet_id = tweet["tweet_id"]
+            self._write(tweet)
+            self._segment_count += 1
+        self._file.flush()
+
+    @property
+    def segment_count(self):
+        return self._segment_count
+
+    def commit(self, backup_time, **extra):
+        """写入 manifest 提交当前段。"""
+        self._write(
+            {
+                "type": "manifest",
+                "backup_time": backup_time,
+                "tweet_count": self._segment_count,
+                "head_tweet_id": self._head_tweet_id,
+                **extra,
+            }
+        )
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.close()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def scan_segments(path, start=0):
+    """扫描文件，返回 (已提交段列表, 已提交部分的结尾偏移)。
+
+    每个段为 (起始偏移, 结束偏移, manifest)，结束偏移不含 manifest 行。
+    只保留偏移量，不在内存中保存推文。
+    """
+    segments = []
+    committed_end = start
+    with open(path, "rb") as f:
+        f.seek(start)
+        offset = segment_start = start
+        for line in f:
+            line_end = offset + len(line)
+            if not line.endswith(b"\n"):
+                break
+            if line.startswith(b'{"type": "header"'):
+                segment_start = committed_end = line_end
+            elif line.startswith(b'{"type": "manifest"'):
+                segments.append((segment_start, offset, json.loads(line)))
+                segment_start = committed_end = line_end
+            offset = line_end
+    return segments, committed_end
+
+
+def last_manifest(path):
+    """从文件尾部向前查找最后一条 manifest，找不到时返回 None。"""
+    path = Path(path)
+    if not path.exists():
+        return None
+    block_size = 64 * 1024
+    with open(path, "rb") as f:
+        end = f.seek(0, os.SEEK_END)
+        tail = b""
+        while end > 0:
+            start = max(0, end - block_size)
+            f.seek(start)
+            tail = f.read(end - start) + tail
+            end = start
+            lines = tail.split(b"\n")
+            # 第一段可能不完整，留待下一轮拼接
+            complete_lines = lines if start == 0 else lines[1:]
+            for line in reversed(complete_lines):
+                if line.startswith(b'{"type": "manifest"'):
+                    return json.loads(line)
+            tail = lines[0] if start else b""
+    return None
+
+
+def iter_backup_tweets(path, start=0):
+    """按从新到旧的顺序逐条产出 (推文, 所在段的备份时间)。"""
+    segments, _ = scan_segments(path, start)
+    with open(path, "rb") as f:
+        for segment_start, segment_end, manifest in reversed(segments):
+            f.seek(segment_start)
+            while f.tell() < segment_end:
+                yield json.loads(f.readline()), manifest.get("backup_time")
@@ -0,0 +1,63 @@
+import json
+import logging
+import os
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+
+_logger = logging.getLogger(__name__)
+
+
+class KnownIdIndex:
+    """已归档推文 ID 的紧凑索引。
+
+    以排序后的 int64 数组保存（每个 ID 8 字节），二分查找判断是否已存在，
+    持久化为合并文件旁的 ``*.ids`` 二进制文件。
+    """
+
+    def __init__(self, tweet_ids=()):
+        self._ids = array("q", sorted({int(i) for i in tweet_ids if i}))
+
+    def __contains__(self, tweet_id):
+        try:
+            value = int(tweet_id)
+        except (TypeError, ValueError):
+            return False
+        i = bisect_left(self._ids, value)
+        return i < len(self._ids) and self._ids[i] == value
+
+    def __len__(self):
+        return len(self._ids)
+
+    @classmethod
+    def load(cls, path):
+        index = cls()
+        with open(path, "rb") as f:
+            index._ids.frombytes(f.read())
+        return index
+
+    @classmethod
+    def from_merged_json(cls, merged_json_path):
+        with open(merged_json_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        tweets = data["tweets"] if isinstance(data, dict) else data
+        return cls(t.get("tweet_id") for t in tweets)
+
+    def save(self, path):
+        path = Path(path)
+        tmp_path = path.with_name(f"{path.name}.tmp")
+        with open(tmp_path, "wb") as f:
+            self._ids.tofile(f)
+        os.replace(tmp_path, path)
+
+
+def load_known_ids(index_path, merged_json_path):
+    """读取已知 ID 索引；索引缺失时从合并文件构建一次。"""
+    if Path(index_path).exists():
+        return KnownIdIndex.load(index_path)
+    if Path(merged_json_path).exists():
+        _logger.info(f"已知 ID 索引不存在，从 {merged_json_path} 构建")
+        index = KnownIdIndex.from_merged_json(merged_json_path)
+        index.save(index_path)
+        return index
+    return KnownIdIndex()
@@ -0,0 +1,92 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import urlparse
+
+_logger = logging.getLogger(__name__)
+
+
+class MediaDownloader:
+    """并发媒体下载：总并发数与每个主机的并发数分别受限。
+
+    ``fetch(url, local_path) -> bool`` 在工作线程中执行实际下载。
+    同一本地路径只下载一次：进行中的重复提交返回同一个 Future，
+    已完成的直接返回记录的结果。
+    """
+
+    # 两次进度日志之间的最短间隔（秒）
+    progress_interval = 5.0
+
+    def __init__(self, fetch, max_workers=8, per_host=4):
+        self._fetch = fetch
+        self._per_host = max(1, per_host)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, max_workers), thread_name_prefix="media"
+        )
+        self._lock = threading.Lock()
+        self._host_slots = {}
+        self._futures = {}
+        self._results = {}
+        self.submitted = 0
+        self.done = 0
+        self.failed = 0
+        self._last_report = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def submit(self, url, local_path):
+        key = str(local_path)
+        with self._lock:
+            if key in self._results:
+                future = Future()
+                future.set_result(self._results[key])
+                return future
+            future = self._futures.get(key)
+            if future is None:
+                future = self._executor.submit(self._download, url, local_path)
+                self._futures[key] = future
+                self.submitted += 1
+            return future
+
+    def _host_slot(self, url):
+        host = urlparse(url).hostname or ""
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.Semaphore(self._per_host)
+            return slot
+
+    def _download(self, url, local_path):
+        success = False
+        try:
+            with self._host_slot(url):
+                success = self._fetch(url, local_path)
+            return success
+        finally:
+            self._count(str(local_path), success)
+
+    def _count(self, key, success):
+        with self._lock:
+            # 完成后只保留结果，不再持有 Future
+            self._results[key] = success
+            self._futures.pop(key, None)
+            self.done += 1
+            self.failed += not success
+            now = time.monotonic()
+            if now - self._last_report < self.progress_interval:
+                return
+            self._last_report = now
+        self.report()
+
+    def report(self):
+        _logger.info(
+            f"媒体下载进度：{self.done}/{self.submitted} 个文件，失败 {self.failed} 个"
+        )
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
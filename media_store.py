@@ -0,0 +1,258 @@
+"""媒体库：按内容哈希去重，并记录每个 URL 的下载状态。
+
+去重时文件实际保存为 ``media/.blobs/<哈希前两位>/<sha256>.<扩展名>``，
+``media/`` 下按 ``media_filename_pattern`` 命名的文件都是指向这些文件的硬链接
+（文件系统不支持硬链接时退回复制）。索引保存在站点目录的 ``media_index.sqlite3``：
+
+- ``urls``：规范化的媒体 URL -> 内容哈希；
+- ``links``：``media/`` 下的文件名 -> 规范化 URL；
+- ``failures``：下载失败的 URL、失败类别、尝试次数与下次重试时间。
+
+同一 URL 只下载一次，内容相同的文件只保存一份；索引中已有的文件名直接视为完成，
+不再逐个检查文件是否存在。永久失败（404、410 等）的 URL 不再请求，
+临时失败（超时、5xx、429 等）按指数退避跨多次运行重试。
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import httpx as requests
+
+_logger = logging.getLogger(__name__)
+
+# 每写入多少条索引记录提交一次
+_COMMIT_EVERY = 100
+# 重试也不会成功的 HTTP 状态码：已删除、账号注销、视频链接过期等
+_PERMANENT_STATUS = {400, 401, 403, 404, 410, 451}
+
+
+def url_key(url):
+    """规范化媒体 URL：去掉协议，旧式 ``.jpg`` 后缀改写为 format 参数，查询参数排序。"""
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query))
+    path = parts.path
+    if parts.netloc == "pbs.twimg.com":
+        stem, dot, ext = path.rpartition(".")
+        if dot and "/" not in ext:
+            path = stem
+            query.setdefault("format", ext)
+    return f"{parts.netloc}{path}?{urlencode(sorted(query.items()))}"
+
+
+def failure_class(exc):
+    """返回 ("permanent" | "transient", HTTP 状态码或 None)。"""
+    if isinstance(exc, requests.HTTPStatusError):
+        code = exc.response.status_code
+        return ("permanent" if code in _PERMANENT_STATUS else "transient"), code
+    return "transient", None
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1 << 20):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class MediaStore:
+    def __init__(
+        self, media_dir, index_path, dedupe=True, backoff_base=3600, backoff_max=604800
+    ):
+        self.media_dir = Path(media_dir)
+        self.dedupe = dedupe
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.blob_dir = self.media_dir / ".blobs"
+        self._conn = sqlite3.connect(index_path, check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS urls ("
+            "url_key TEXT PRIMARY KEY, sha256 TEXT NOT NULL, ext TEXT, size INTEGER,"
+            " fetched_at REAL);"
+            "CREATE TABLE IF NOT EXISTS links ("
+            "filename TEXT PRIMARY KEY, url_key TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS failures ("
+            "url_key TEXT PRIMARY KEY, failure TEXT NOT NULL, status_code INTEGER,"
+            " attempts INTEGER NOT NULL, last_attempt REAL, retry_at REAL);"
+        )
+        self._conn.commit()
+        # 启动时一次性载入索引
+        self._urls = {
+            key: (sha256, ext)
+            for key, sha256, ext in self._conn.execute(
+                "SELECT url_key, sha256, ext FROM urls"
+            )
+        }
+        # 只读一次目录列表，剔除已被删除的文件，不逐个检查文件
+        present = (
+            {entry.name for entry in os.scandir(self.media_dir)}
+            if self.media_dir.is_dir()
+            else set()
+        )
+        self._links = {
+            filename: key
+            for filename, key in self._conn.execute("SELECT filename, url_key FROM links")
+            if filename in present
+        }
+        self._failures = {
+            key: (failure, attempts, retry_at)
+            for key, failure, attempts, retry_at in self._conn.execute(
+                "SELECT url_key, failure, attempts, retry_at FROM failures"
+            )
+        }
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._pending = 0
+        self.downloaded = 0
+        self.reused = 0
+        self.skipped = 0
+
+    def fetch(self, url, local_path, download):
+        """确保 local_path 为 url 对应的媒体，返回是否成功。
+
+        ``download(url, path)`` 执行实际下载，失败时抛出异常。
+        """
+        key = url_key(url)
+        local_path = Path(local_path)
+        if self._links.get(local_path.name) == key:
+            return True
+        if (failure := self._failures.get(key)) and not self._due(failure):
+            self.skipped += 1
+            return False
+        with self._key_lock(key):
+            try:
+                self._fetch(url, key, local_path, download)
+            except Exception as e:
+                self._record_failure(key, e)
+                _logger.error(
+                    f"文件下载失败。url:{url}, filename:{local_path.name}, 原因：{e}"
+                )
+                return False
+        self._record("INSERT OR REPLACE INTO links VALUES (?, ?)", (local_path.name, key))
+        self._links[local_path.name] = key
+        return True
+
+    def _fetch(self, url, key, local_path, download):
+        blob = self._blob_path(key) if self.dedupe else None
+        if blob is not None and blob.exists():
+            self.reused += 1
+        elif local_path.exists():
+            # 之前已下载的文件直接记入索引（去重时并入媒体库）
+            blob = self._add_blob(local_path, key, keep=True)
+        else:
+            _logger.info(f"Downloading media {local_path.name}...")
+            # 下载到 .part 文件，完整后才移入媒体库；临时失败时保留以便续传
+            part_path = local_path.with_name(f"{local_path.name}.part")
+            try:
+                download(url, part_path)
+            except Exception as e:
+                if failure_class(e)[0] == "permanent":
+                    part_path.unlink(missing_ok=True)
+                raise
+            blob = self._add_blob(part_path, key, keep=False)
+            self.downloaded += 1
+        if self.dedupe:
+            self._link(blob, local_path)
+        elif blob != local_path:
+            blob.replace(local_path)
+        if self._failures.pop(key, None):
+            self._record("DELETE FROM failures WHERE url_key = ?", (key,))
+
+    def _due(self, failure):
+        kind, _, retry_at = failure
+        return kind != "permanent" and time.time() >= (retry_at or 0)
+
+    def _record_failure(self, key, exc):
+        kind, status_code = failure_class(exc)
+        attempts = self._failures.get(key, (None, 0, None))[1] + 1
+        now = time.time()
+        retry_at = None
+        if kind == "transient":
+            retry_at = now + min(
+                self.backoff_base * 2 ** (attempts - 1), self.backoff_max
+            )
+        self._failures[key] = (kind, attempts, retry_at)
+        self._record(
+            "INSERT OR REPLACE INTO failures VALUES (?, ?, ?, ?, ?, ?)",
+            (key, kind, status_code, attempts, now, retry_at),
+        )
+
+    def _key_lock(self, key):
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = self._key_locks[key] = threading.Lock()
+            return lock
+
+    def _blob_path(self, key):
+        if (found := self._urls.get(key)) is None:
+            return None
+        sha256, ext = found
+        return self.blob_dir / sha256[:2] / f"{sha256}{ext}"
+
+    def _add_blob(self, path, key, keep):
+        """记录 path 的内容哈希与大小；去重时把内容存入媒体库（keep 为 False 时移动文件）。
+
+        返回内容所在的路径。
+        """
+        sha256 = file_sha256(path)
+        ext = Path(path.name.removesuffix(".part")).suffix
+        blob = self.blob_dir / sha256[:2] / f"{sha256}{ext}"
+        if not self.dedupe:
+            blob = path
+        elif blob.exists():
+            if not keep:
+                path.unlink()
+        else:
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            if keep:
+                _link_or_copy(path, blob)
+            else:
+                path.replace(blob)
+        self._record(
+            "INSERT OR REPLACE INTO urls VALUES (?, ?, ?, ?, ?)",
+            (key, sha256, ext, blob.stat().st_size, time.time()),
+        )
+        self._urls[key] = (sha256, ext)
+        return blob
+
+    @staticmethod
+    def _link(blob, local_path):
+        if local_path.exists() and os.path.samefile(blob, local_path):
+            return
+        tmp_path = local_path.with_name(f"{local_path.name}.link")
+        tmp_path.unlink(missing_ok=True)
+        _link_or_copy(blob, tmp_path)
+        tmp_path.replace(local_path)
+
+    def _record(self, sql, params):
+        with self._lock:
+            self._conn.execute(sql, params)
+            self._pending += 1
+            if self._pending >= _COMMIT_EVERY:
+                self._conn.commit()
+                self._pending = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
+        if self.downloaded or self.reused or self.skipped:
+            _logger.info(
+                f"媒体库：新下载 {self.downloaded} 个文件，复用已有文件 {self.reused} 个，"
+                f"跳过已知失败的 URL {self.skipped} 个"
+            )
+
+
+def _link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
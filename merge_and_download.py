@@ -1,164 +1,383 @@
 import json
 import logging
 import os
+from collections import deque
 from copy import deepcopy
 from datetime import datetime
+from itertools import islice
 from pathlib import Path
 from time import sleep
 from urllib.parse import parse_qs, urlencode, urlparse
 
 import httpx as requests
-import networkx as nx
 
+from archive_store import ArchiveStore
 from build_site import build_site
-from config import config
+from config import account_configs, config
+from context_expander import ContextExpander
+from json_stream import iter_events, iter_items, read_meta
+from jsonl_backup import iter_backup_tweets
+from known_ids import KnownIdIndex
+from media_downloader import MediaDownloader
+from media_store import MediaStore
+from merge_manifest import MergeInput, MergeManifest
+from sequence_merge import MERGE_ENGINES, SequenceGraph
+from thumbnails import generate_thumbnails
 from time_util import (
     DateTimeFormat,
     convert_datetime_format,
     format_datetime,
+    format_epoch_ms,
     system_tz,
 )
+from tweet_record import add_epoch_ms, merge_versions
+from tweet_spool import TweetSpool
 
 _logger = logging.getLogger(__name__)
 
 
+def _range_total(resp, offset):
+    """206 响应中完整文件的字节数；起始位置与 offset 不符或总长未知时返回 None。"""
+    # Content-Range: bytes <start>-<end>/<total>
+    unit_range, _, total = resp.headers.get("Content-Range", "").partition("/")
+    start = unit_range.removeprefix("bytes ").partition("-")[0]
+    if start != str(offset) or not total.isdigit():
+        return None
+    return int(total)
+
+
 class TweetMerger:
-    def __init__(self):
-        self.json_filename_base = config["output_json_path"].stem
-        self.enable_media_download = config.get("enable_media_download", True)
-        self.media_filename_pattern = config.get(
+    def __init__(self, cfg=config):
+        self.config = cfg
+        self.json_filename_base = self.config["output_json_path"].stem
+        self.enable_media_download = self.config.get("enable_media_download", True)
+        self.media_filename_pattern = self.config.get(
             "media_filename_pattern",
             "{user_name}_{datetime}_{media_type}{num}_tid{tweet_id}_uid{user_id}.{extension}",
         )
 
-        self.graph = nx.DiGraph()
+        # 只读取上次合并以来新增的备份内容
+        self.incremental_merge = self.config.get("incremental_merge", True)
+        self.merge_engine = MERGE_ENGINES[self.config.get("merge_engine", "sequence")]
+        # 流式合并：推文暂存在磁盘上，内存中只保留 ID 与偏移
+        self.streaming = self.config.get("merge_streaming", False)
+        # sqlite：合并结果保存在数据库中，更新媒体文件名只改动相应的行
+        self.archive_store = self.config.get("archive_store", "json")
+        self.store = None
+        self.graph = SequenceGraph()
+        self.tweets = {}
+
+        # 媒体并发下载：总并发数与单个主机的并发数
+        self.media_workers = self.config.get("media_download_workers", 8)
+        self.media_per_host = self.config.get("media_download_per_host", 4)
+        self.media_window = self.config.get("media_download_window", 500)
+        # 媒体按内容哈希存储，media/ 下的文件名为硬链接
+        self.media_dedupe = self.config.get("media_dedupe", True)
 
         proxy = os.environ.get("http_proxy") or os.environ.get("all_proxy")
         self._client = requests.Client(
-            transport=requests.HTTPTransport(retries=3), timeout=1, proxy=proxy
+            transport=requests.HTTPTransport(
+                retries=3,
+                limits=requests.Limits(
+                    max_connections=self.media_workers,
+                    max_keepalive_connections=self.media_workers,
+                ),
+            ),
+            timeout=1,
+            proxy=proxy,
         )
 
     def find_tweets_files(self):
         files = sorted(
             p
-            for p in config["site_path"].glob(f"{self.json_filename_base}*.json")
-            if p != config["merged_json_path"]
+            for pattern in (
+                f"{self.json_filename_base}*.json",
+                f"{self.json_filename_base}*.jsonl",
+            )
+            for p in self.config["site_path"].glob(pattern)
+            if p != self.config["merged_json_path"]
         )
         _logger.info(f"开始合并 {len(files)} 个文件: {[str(f) for f in files]}")
         return files
 
-    def build_graph(self, tweet_files):
-        """从 JSON 文件读取数据并构建DAG图。"""
-        for file_path in tweet_files:
-            _logger.info(f"正在处理文件: {file_path}")
-            with open(file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                # 设置文件中数据的默认备份时间
-                if backup_time := data.get("backup_time"):
-                    backup_time = convert_datetime_format(backup_time, target_tz="UTC")
+    def build_graph(self, merge_inputs):
+        """从 JSON / JSONL 备份文件读取数据，记录各文件中相邻推文的先后关系。"""
+        for merge_input in merge_inputs:
+            _logger.info(f"正在处理文件: {merge_input.path}")
+            previous_tweet_id = None
+            # 同一文件中重复出现的推文（如增量抓取时重新抓到的已归档推文）
+            # 只更新数据，顺序以最新的一次为准，避免产生环
+            seen_ids = set()
+            # 是否含有此前已合并的推文；含有时新推文已由这些推文接入原有顺序，
+            # 原有的首条推文（可能已取消点赞）接在第一条已合并推文之前
+            overlaps = False
+            before_overlap = None
+            # 创建DAG图
+            for current_tweet, backup_time in self._iter_backup_tweets(merge_input):
+                current_tweet.setdefault(
+                    "updated_at", current_tweet.pop("backup_time", backup_time)
+                )
+                # 比较新旧版本用整数毫秒时间戳，旧归档在此补齐
+                add_epoch_ms(current_tweet)
+
+                cur_quote = current_tweet.get("quoted_tweet")
+                if cur_quote and (
+                    cur_quote.get("tweet_type") == "TweetTombstone"
+                    or not cur_quote["tweet_id"]
+                ):
+                    cur_quote["tombstone"] = cur_quote.pop("tweet_content")
+                    cur_quote.pop("tweet_type", None)
+
+                current_tweet_id = current_tweet["tweet_id"]
+                # 节点采用最新推文数据
+                if current_tweet_id not in self.tweets:
+                    self.graph.add_node(current_tweet_id)
+                    self.tweets[current_tweet_id] = current_tweet
                 else:
-                    file_stat = file_path.stat()
-                    if hasattr(file_stat, "st_birthtime"):
-                        _logger.warning(
-                            f"{file_path}: 备份时间缺失，使用文件创建时间为推特默认更新时间"
-                        )
-                        backup_timestamp = file_stat.st_birthtime
-                    else:
-                        _logger.warning(
-                            f"{file_path}: 备份时间缺失且创建时间未知，使用文件修改时间"
-                        )
-                        backup_timestamp = file_stat.st_ctime
-
-                    backup_time = format_datetime(
-                        datetime.fromtimestamp(backup_timestamp), target_tz="UTC"
+                    if not overlaps and current_tweet_id not in seen_ids:
+                        overlaps = True
+                        before_overlap = previous_tweet_id
+                    node_tweet, changed = merge_versions(
+                        self.tweets[current_tweet_id], current_tweet
                     )
+                    if changed:
+                        self.tweets[current_tweet_id] = node_tweet
 
-                tweets = data.get("tweets", [])
-
-                previous_tweet_id = None
-                # 创建DAG图
-                for current_tweet in tweets:
-                    current_tweet.setdefault(
-                        "updated_at", current_tweet.pop("backup_time", backup_time)
+                if current_tweet_id in seen_ids:
+                    continue
+                seen_ids.add(current_tweet_id)
+
+                if previous_tweet_id:
+                    self.graph.add_edge(previous_tweet_id, current_tweet_id)
+
+                previous_tweet_id = current_tweet_id
+
+            # 增量合并时把新推文接到原有顺序上
+            anchor = before_overlap if overlaps else previous_tweet_id
+            if (
+                anchor
+                and merge_input.next_id in self.tweets
+                and merge_input.next_id not in seen_ids
+            ):
+                self.graph.add_edge(anchor, merge_input.next_id)
+
+    def seed_from_merged(self):
+        """载入上次的合并结果，按其顺序与原始父节点重建图。"""
+        merged_json_path = self.config["merged_json_path"]
+        if self.store is not None:
+            tweets = self.store.iter_tweets()
+        elif self.streaming:
+            tweets = iter_items(merged_json_path)
+        else:
+            with open(merged_json_path, "r", encoding="utf-8") as f:
+                tweets = json.load(f)["tweets"]
+        previous_tweet_id = None
+        for tweet in tweets:
+            tweet_id = tweet["tweet_id"]
+            parents = tweet.pop(
+                "original_parents", [previous_tweet_id] if previous_tweet_id else []
+            )
+            self.graph.add_node(tweet_id)
+            for parent in parents:
+                self.graph.add_edge(parent, tweet_id)
+            self.tweets[tweet_id] = add_epoch_ms(tweet)
+            previous_tweet_id = tweet_id
+        _logger.info(f"已载入上次合并的 {len(self.tweets)} 条推文")
+
+    def _iter_backup_tweets(self, merge_input):
+        """按从新到旧的顺序产出 (推文, 默认备份时间)。"""
+        file_path = merge_input.path
+        if file_path.suffix == ".jsonl":
+            converted = {}
+            for tweet, backup_time in iter_backup_tweets(
+                file_path, start=merge_input.offset
+            ):
+                if backup_time not in converted:
+                    converted[backup_time] = convert_datetime_format(
+                        backup_time, target_tz="UTC"
                     )
+                yield tweet, converted[backup_time]
+            return
 
-                    cur_quote = current_tweet.get("quoted_tweet")
-                    if cur_quote and (
-                        cur_quote.get("tweet_type") == "TweetTombstone"
-                        or not cur_quote["tweet_id"]
-                    ):
-                        cur_quote["tombstone"] = cur_quote.pop("tweet_content")
-                        cur_quote.pop("tweet_type", None)
-
-                    current_tweet_id = current_tweet["tweet_id"]
-                    # 节点采用最新推文数据
-                    if current_tweet_id not in self.graph:
-                        self.graph.add_node(current_tweet_id, tweet=current_tweet)
-                    else:
-                        node_tweet = self.graph.nodes[current_tweet_id]["tweet"]
-                        rival_tweet = current_tweet
-
-                        # 保持 node_tweet 为较新版本
-                        if rival_tweet["updated_at"] > node_tweet["updated_at"]:
-                            self.graph.nodes[current_tweet_id]["tweet"] = rival_tweet
-                            node_tweet, rival_tweet = rival_tweet, node_tweet
-
-                        # 合并墓碑引文
-                        node_quote = node_tweet.get("quoted_tweet")
-                        rival_quote = rival_tweet.get("quoted_tweet")
-
-                        if not node_quote:
-                            if rival_quote:
-                                node_tweet["quoted_tweet"] = rival_quote
-                        elif (
-                            "tombstone" in node_quote
-                            and rival_quote
-                            and "tweet_content" in rival_quote
-                        ):
-                            # 节点有墓碑信息，另一侧有完整引文，合并较新引文
-                            node_q_updated = node_quote.get("updated_at", '0')
-                            rival_q_updated = rival_quote.get(
-                                "updated_at", rival_tweet["updated_at"]
-                            )
-                            if rival_q_updated > node_q_updated:
-                                rival_quote |= {
-                                    "updated_at": rival_q_updated,
-                                    **(
-                                        node_quote
-                                        if node_quote.get("user_nick") is not None
-                                        else {}
-                                    ),
-                                    "tombstone": node_quote["tombstone"],
-                                    "tombstone_updated_at": node_tweet["updated_at"],
-                                }
-                                node_tweet["quoted_tweet"] = rival_quote
-
-                    if previous_tweet_id:
-                        self.graph.add_edge(previous_tweet_id, current_tweet_id)
-
-                    previous_tweet_id = current_tweet_id
-
-        TR = nx.transitive_reduction(self.graph)
-        TR.add_nodes_from(self.graph.nodes(data=True))
-        self.graph = TR
-
-    def merge_and_save(self):
+        if self.streaming:
+            tweets = iter_items(file_path)
+            backup_time = self._stream_backup_time(file_path)
+        else:
+            with open(file_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            tweets = data.get("tweets", [])
+            backup_time = data.get("backup_time")
+        # 设置文件中数据的默认备份时间
+        if backup_time:
+            backup_time = convert_datetime_format(backup_time, target_tz="UTC")
+        else:
+            file_stat = file_path.stat()
+            if hasattr(file_stat, "st_birthtime"):
+                _logger.warning(
+                    f"{file_path}: 备份时间缺失，使用文件创建时间为推特默认更新时间"
+                )
+                backup_timestamp = file_stat.st_birthtime
+            else:
+                _logger.warning(
+                    f"{file_path}: 备份时间缺失且创建时间未知，使用文件修改时间"
+                )
+                backup_timestamp = file_stat.st_ctime
+
+            backup_time = format_datetime(
+                datetime.fromtimestamp(backup_timestamp), target_tz="UTC"
+            )
+
+        for tweet in islice(tweets, merge_input.limit):
+            yield tweet, backup_time
+
+    @staticmethod
+    def _stream_backup_time(file_path):
+        """backup_time 通常位于 tweets 之前，只有在其后时才需要扫描整个文件。"""
+        for event in iter_events(file_path):
+            if event[0] == "item":
+                break
+            if event[1] == "backup_time":
+                return event[2]
+        else:
+            return None
+        return read_meta(file_path).get("backup_time")
+
+    def merge_and_save(self, expander=None):
         tweet_files = self.find_tweets_files()
         if not tweet_files:
             _logger.info("未找到需要合并的文件。")
             return
 
-        self.build_graph(tweet_files)
+        self.tweets = TweetSpool(self.config["site_path"]) if self.streaming else {}
+        if self.archive_store == "sqlite":
+            self.store = ArchiveStore(self.config["archive_db_path"])
+        try:
+            self._merge_and_save(tweet_files, expander)
+        finally:
+            if self.streaming:
+                self.tweets.close()
+            if self.store is not None:
+                self.store.close()
+                self.store = None
+
+    def _merge_and_save(self, tweet_files, expander):
+        manifest = MergeManifest.load(self.config["merge_manifest_path"])
+        merge_inputs = None
+        incremental = False
+        if self.store is not None:
+            merged_exists = self.store.count() > 0
+        else:
+            merged_exists = self.config["merged_json_path"].exists()
+        if self.incremental_merge and merged_exists:
+            merge_inputs = manifest.plan(tweet_files)
+        if merge_inputs is None:
+            manifest.record_all(tweet_files)
+            merge_inputs = [MergeInput(p) for p in tweet_files]
+        elif not merge_inputs:
+            # 不重新合并，但仍照常写出结果，重试上下文补充与媒体下载
+            _logger.info("备份文件没有变化，沿用上次的合并顺序。")
+            self.seed_from_merged()
+        else:
+            _logger.info(f"增量合并 {len(merge_inputs)} 个新增或追加的文件")
+            self.seed_from_merged()
+            incremental = True
+
+        if merge_inputs:
+            sorted_nodes, reduced_parents = self._merge(
+                merge_inputs, tweet_files, manifest, incremental
+            )
+        else:
+            sorted_nodes = list(self.graph.nodes())
+            reduced_parents = {
+                node_id: self.graph.predecessors(node_id) for node_id in sorted_nodes
+            }
+
+        sorted_tweets = self._iter_sorted_tweets(sorted_nodes, reduced_parents)
+        if self.streaming or self.store is not None:
+            if expander:
+                # 先扫描一遍收集缺失的上下文，写出时逐条补充
+                cached = expander.lookup(
+                    expander.collect_missing(
+                        (self.tweets[node_id] for node_id in sorted_nodes),
+                        archived=self.tweets,
+                    )
+                )
+                sorted_tweets = (
+                    expander.attach_one(tweet, cached) for tweet in sorted_tweets
+                )
+            if self.store is not None:
+                self.store.write_merged(sorted_tweets)
+            else:
+                self._write_merged_stream(len(sorted_nodes), sorted_tweets)
+        else:
+            sorted_tweets = list(sorted_tweets)
+            if expander:
+                # 补充回复父推文与墓碑引用
+                expander.expand(sorted_tweets)
+            output_data = {
+                "tweet_count": len(sorted_tweets),
+                "tweets": sorted_tweets,
+            }
+            self._write_merged(output_data)
 
-        _logger.info("正在拓扑排序...")
-        sorted_nodes = list(nx.topological_sort(self.graph))
+        merged_path = (
+            self.config["archive_db_path"]
+            if self.store is not None
+            else self.config["merged_json_path"]
+        )
+        _logger.info(f"{len(sorted_nodes)} 条推特已合并至 {merged_path}")
+        manifest.save()
+        # 供增量抓取判断推文是否已归档
+        KnownIdIndex(sorted_nodes).save(self.config["known_ids_path"])
+
+        _logger.info("合并完成。")
 
-        sorted_tweets = []
-        for node_id in sorted_nodes:
-            # 从节点中取出推文数据
-            sorted_tweets.append(self.graph.nodes[node_id]["tweet"])
+        if self.enable_media_download:
+            _logger.info("开始下载媒体...")
+            if self.store is not None:
+                updated = 0
+                for tweet in self.download_all_media(self.store.iter_tweets()):
+                    updated += self.store.update_media(tweet)
+                self.store.commit()
+                _logger.info(f"已更新 {updated} 个媒体文件名")
+            elif self.streaming:
+                self._write_merged_stream(
+                    len(sorted_nodes),
+                    self.download_all_media(iter_items(self.config["merged_json_path"])),
+                )
+            else:
+                for _ in self.download_all_media(sorted_tweets):
+                    pass
+                self._write_merged(output_data)
+            _logger.info("媒体下载完毕")
+            if self.config.get("enable_thumbnails", True):
+                generate_thumbnails(self.config)
 
-        for i, tweet in enumerate(sorted_tweets):
+    def _merge(self, merge_inputs, tweet_files, manifest, incremental):
+        """建图并排序；增量合并出现环（如重新点赞的推文）时改为完整合并。"""
+        self.build_graph(merge_inputs)
+        _logger.info("正在拓扑排序...")
+        try:
+            return self.merge_engine(self.graph)
+        except ValueError:
+            if not incremental:
+                raise
+            _logger.warning("增量合并的推文顺序与上次的结果存在环，改为完整合并")
+        self.graph = SequenceGraph()
+        if self.streaming:
+            self.tweets.close()
+            self.tweets = TweetSpool(self.config["site_path"])
+        else:
+            self.tweets = {}
+        manifest.record_all(tweet_files)
+        self.build_graph([MergeInput(p) for p in tweet_files])
+        _logger.info("正在拓扑排序...")
+        return self.merge_engine(self.graph)
+
+    def _iter_sorted_tweets(self, sorted_nodes, reduced_parents):
+        """按合并顺序逐条产出整理后的推文。"""
+        for i, node_id in enumerate(sorted_nodes):
+            tweet = self.tweets[node_id]
             quote = tweet.get("quoted_tweet") or tweet.get("retweeted_tweet")
             for t in [tweet, quote]:
                 if not t:
@@ -177,39 +396,61 @@ class TweetMerger:
 
             # 标注需要明确父节点的条目
             # 跳过首节点
-            if i == 0:
-                continue
-
-            node_id = tweet["tweet_id"]
-
-            # 获取简约图父节点
-            parents = list(self.graph.predecessors(node_id))
-
-            # 若拓扑排序前驱与父节点不一致，则记录父节点
-            if [sorted_nodes[i - 1]] != parents:
-                tweet["original_parents"] = parents
-                _logger.info(f"已标记推特 {node_id} 的原始父节点: {parents}")
-
-        output_data = {
-            "tweet_count": len(sorted_tweets),
-            "tweets": sorted_tweets,
-        }
-
-        _logger.info(
-            f"{len(sorted_tweets)} 条推特已合并至 {config['merged_json_path']}"
+            if i > 0:
+                # 获取简约图父节点
+                parents = reduced_parents[node_id]
+
+                # 若拓扑排序前驱与父节点不一致，则记录父节点
+                if [sorted_nodes[i - 1]] != parents:
+                    tweet["original_parents"] = parents
+                    _logger.info(f"已标记推特 {node_id} 的原始父节点: {parents}")
+            yield tweet
+
+    def download_all_media(self, tweets):
+        """并发下载媒体，按输入顺序产出已记录文件名的推文。
+
+        最多同时处理 media_download_window 条推文，流式合并时内存占用不随归档增长。
+        """
+        media_store = MediaStore(
+            Path(self.config["site_path"], "media"),
+            self.config["site_path"] / "media_index.sqlite3",
+            dedupe=self.media_dedupe,
+            backoff_base=self.config.get("media_retry_backoff_base", 3600),
+            backoff_max=self.config.get("media_retry_backoff_max", 604800),
         )
-        self._write_merged(output_data)
 
-        _logger.info("合并完成。")
+        def fetch(url, local_path):
+            return media_store.fetch(url, local_path, self.download_file)
 
-        if self.enable_media_download:
-            _logger.info("开始下载媒体...")
-            for tweet in sorted_tweets:
-                self.download_media(tweet)
-            self._write_merged(output_data)
-            _logger.info("媒体下载完毕")
+        try:
+            yield from self._download_window(tweets, fetch)
+        finally:
+            media_store.close()
+
+    def _download_window(self, tweets, fetch):
+        window = deque()
+        with MediaDownloader(fetch, self.media_workers, self.media_per_host) as downloader:
+            for tweet in tweets:
+                jobs = [
+                    (media_item, filename, downloader.submit(url, local_path))
+                    for media_item, url, filename, local_path in self._media_jobs(tweet)
+                ]
+                window.append((tweet, jobs))
+                if len(window) > self.media_window:
+                    yield self._finish_media(*window.popleft())
+            while window:
+                yield self._finish_media(*window.popleft())
+            downloader.report()
+
+    @staticmethod
+    def _finish_media(tweet, jobs):
+        for media_item, filename, future in jobs:
+            if future.result():
+                media_item["filename"] = filename
+        return tweet
 
-    def download_media(self, tweet):
+    def _media_jobs(self, tweet):
+        """产出推文及其引用、转推、回复父推文中的 (媒体项, URL, 文件名, 本地路径)。"""
         if (avatar := tweet.get("avatar")) is None:
             # 没有头像说明是墓碑推文
             return
@@ -224,11 +465,12 @@ class TweetMerger:
             else:
                 ext = url.split("?")[0].split(".")[-1]
                 filename = self.media_filename_pattern.format(
+                    user_name=tweet.get("user_name", "user"),
                     user_nick=tweet.get("user_name", "user"),
-                    datetime=convert_datetime_format(
-                        tweet.get("tweet_created_at"),
-                        to_format=DateTimeFormat.FILENAME,
-                        target_tz=system_tz,
+                    datetime=format_epoch_ms(
+                        add_epoch_ms(tweet)["tweet_created_at_ms"],
+                        system_tz,
+                        DateTimeFormat.FILENAME,
                     ),
                     media_type=media_item.get("type", "media"),
                     num=idx,
@@ -236,37 +478,86 @@ class TweetMerger:
                     user_id=tweet.get("user_id", ""),
                     extension=ext,
                 )
-            media_local_path = Path(config["site_path"], "media", filename)
-            success = self.download_file(url, media_local_path)
-            if success:
-                media_item["filename"] = filename
-
-        if tweet.get("quoted_tweet"):
-            self.download_media(tweet["quoted_tweet"])
-        if tweet.get("retweeted_tweet"):
-            self.download_media(tweet["retweeted_tweet"])
-
-    def download_file(self, url, local_path):
-        filename = local_path.name
-        if local_path.exists():
-            return True
-        _logger.info(f"Downloading media {filename}...")
-        try:
-            resp = self._client.get(url)
-            resp.raise_for_status()
-            local_path.parent.mkdir(parents=True, exist_ok=True)
-            with open(local_path, "wb") as f:
-                f.write(resp.content)
-            return True
-        except Exception as e:
-            _logger.error(f"文件下载失败。url:{url}, filename:{filename}, 原因：{e}")
-            return False
+            media_local_path = Path(self.config["site_path"], "media", filename)
+            yield media_item, url, filename, media_local_path
+
+        for key in ("quoted_tweet", "retweeted_tweet", "in_reply_to_tweet"):
+            if tweet.get(key):
+                yield from self._media_jobs(tweet[key])
+
+    def download_file(self, url, part_path):
+        """流式下载 url 到 part_path，失败时抛出异常（由媒体库记录失败类别）。
+
+        part_path 已有部分内容时用 Range 请求续传；下载完成后核对 Content-Length，
+        不完整时保留已下载的部分供下次续传。
+        """
+        part_path.parent.mkdir(parents=True, exist_ok=True)
+        for _ in range(2):
+            offset = part_path.stat().st_size if part_path.exists() else 0
+            # 要求不压缩传输，使写入的字节数可与 Content-Length 核对
+            headers = {"Accept-Encoding": "identity"}
+            if offset:
+                headers["Range"] = f"bytes={offset}-"
+                _logger.info(f"从 {offset} 字节处续传 {part_path.name}")
+            with self._client.stream("GET", url, headers=headers) as resp:
+                if resp.status_code == 416:
+                    # 已有部分超出文件长度，不可续传，重新下载
+                    part_path.unlink()
+                    continue
+                resp.raise_for_status()
+                if resp.status_code == 206:
+                    expected = _range_total(resp, offset)
+                    if expected is None:
+                        # 返回的范围与请求不符，重新下载
+                        part_path.unlink()
+                        continue
+                    mode = "ab"
+                else:
+                    # 服务器忽略了 Range 时从头写入
+                    length = resp.headers.get("Content-Length", "")
+                    expected = int(length) if length.isdigit() else None
+                    mode = "wb"
+                with open(part_path, mode) as f:
+                    for chunk in resp.iter_bytes(1 << 16):
+                        f.write(chunk)
+            size = part_path.stat().st_size
+            if expected is not None and size != expected:
+                raise RuntimeError(f"下载不完整：{size}/{expected} 字节")
+            return
+        raise RuntimeError("续传失败：服务器拒绝了 Range 请求")
 
     def _write_merged(self, output_data: dict):
-        with open(config['merged_json_path'], "w", encoding="utf-8") as f:
+        with open(self.config['merged_json_path'], "w", encoding="utf-8") as f:
             json.dump(output_data, f, ensure_ascii=False, indent=2, default=str)
 
+    def _write_merged_stream(self, tweet_count, tweets):
+        """逐条写出合并结果，格式与 _write_merged 相同；写完后原子替换。"""
+        merged_json_path = self.config["merged_json_path"]
+        tmp_path = merged_json_path.with_name(f"{merged_json_path.name}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(f'{{\n  "tweet_count": {tweet_count},\n  "tweets": [')
+            for i, tweet in enumerate(tweets):
+                f.write(",\n    " if i else "\n    ")
+                f.write(
+                    json.dumps(tweet, ensure_ascii=False, indent=2, default=str).replace(
+                        "\n", "\n    "
+                    )
+                )
+            f.write("\n  ]\n}" if tweet_count else "]\n}")
+        tmp_path.replace(merged_json_path)
+
 
 if __name__ == "__main__":
-    TweetMerger().merge_and_save()
-    build_site()
+    for account_cfg in account_configs():
+        # 未经下载器时只使用已缓存的上下文推文
+        expander = (
+            ContextExpander(account_cfg)
+            if account_cfg.get("enable_context_expansion")
+            else None
+        )
+        try:
+            TweetMerger(account_cfg).merge_and_save(expander)
+        finally:
+            if expander:
+                expander.close()
+        build_site(account_cfg)
@@ -0,0 +1,170 @@
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from json_stream import iter_items
+from jsonl_backup import scan_segments
+
+_logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+
+
+class MergeInput(NamedTuple):
+    """一次合并需要读取的备份内容。
+
+    JSONL 文件从字节偏移 ``offset`` 处开始读取；
+    JSON 文件只读取前 ``limit`` 条推文（None 为全部）。
+    ``next_id`` 为新内容之后紧接的已合并推文，用于把新推文接到原有顺序上。
+    """
+
+    path: Path
+    offset: int = 0
+    limit: Optional[int] = None
+    next_id: Optional[str] = None
+
+
+class MergeManifest:
+    """记录已并入合并文件的各备份文件状态（大小、修改时间、内容哈希）。
+
+    保存在合并文件旁的 ``*.manifest`` 中。下次合并时：
+
+    - 未变化的文件跳过；
+    - 新文件整体读取；
+    - JSONL 文件只在尾部追加了新段时，从上次的结尾继续读取；
+    - 增量模式下重写的 JSON 文件，若旧推文序列原样位于末尾，只读取前面新增的推文；
+    - 其他变化（文件被修改或删除）返回 None，需要完整重建。
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.files = {}
+        self._pending = {}
+
+    @classmethod
+    def load(cls, path):
+        manifest = cls(path)
+        try:
+            data = json.loads(manifest.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return manifest
+        if data.get("version") == MANIFEST_VERSION:
+            manifest.files = data.get("files", {})
+        return manifest
+
+    def plan(self, tweet_files):
+        """返回需要读取的 MergeInput 列表；需要完整重建时返回 None。"""
+        if not self.files:
+            return None
+        current = {p.name for p in tweet_files}
+        removed = self.files.keys() - current
+        if removed:
+            _logger.info(f"备份文件已删除：{sorted(removed)}，需要完整合并")
+            return None
+
+        inputs = []
+        for path in tweet_files:
+            old = self.files.get(path.name)
+            stat = path.stat()
+            if (
+                old
+                and old["mtime_ns"] == stat.st_mtime_ns
+                and old["size"] == stat.st_size
+            ):
+                continue
+            state = file_state(path)
+            self._pending[path.name] = state
+            if not old:
+                inputs.append(MergeInput(path))
+            elif state["sha256"] == old["sha256"]:
+                continue
+            elif path.suffix == ".jsonl" and _has_prefix(path, old):
+                inputs.append(
+                    MergeInput(
+                        path,
+                        offset=old["size"],
+                        next_id=_last_head_tweet_id(path, old["size"]),
+                    )
+                )
+            elif (
+                path.suffix == ".json"
+                and (added := state["tweet_count"] - old["tweet_count"]) >= 0
+                and _ids_sha256(state["ids"][added:]) == old["ids_sha256"]
+            ):
+                next_id = state["ids"][added] if old["tweet_count"] else None
+                inputs.append(MergeInput(path, limit=added, next_id=next_id))
+            else:
+                _logger.info(f"{path} 已被修改，需要完整合并")
+                return None
+        return inputs
+
+    def record_all(self, tweet_files):
+        """完整合并后重新记录全部文件。"""
+        self.files = {}
+        self._pending = {p.name: file_state(p) for p in tweet_files}
+
+    def save(self):
+        for name, state in self._pending.items():
+            state.pop("ids", None)
+            self.files[name] = state
+        self._pending = {}
+        tmp_path = self.path.with_name(f"{self.path.name}.tmp")
+        tmp_path.write_text(
+            json.dumps({"version": MANIFEST_VERSION, "files": self.files}, indent=2),
+            encoding="utf-8",
+        )
+        tmp_path.replace(self.path)
+
+
+def file_state(path):
+    stat = os.stat(path)
+    if path.suffix == ".jsonl":
+        # 只记录已提交的部分，未提交的尾部下次写入时会被截断
+        committed_end = scan_segments(path)[1]
+        return {
+            "size": committed_end,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": _sha256(path, committed_end),
+        }
+    # 流式读取，只在内存中保留推文 ID
+    ids = [t.get("tweet_id") for t in iter_items(path)]
+    return {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": _sha256(path, stat.st_size),
+        "tweet_count": len(ids),
+        "ids_sha256": _ids_sha256(ids),
+        "ids": ids,
+    }
+
+
+def _last_head_tweet_id(path, end):
+    """end 之前最后一段（即此前最新的一次备份）的首条推文。"""
+    segments = [s for s in scan_segments(path)[0] if s[1] < end]
+    return segments[-1][2].get("head_tweet_id") if segments else None
+
+
+def _has_prefix(path, old):
+    return (
+        os.path.getsize(path) >= old["size"]
+        and _sha256(path, old["size"]) == old["sha256"]
+    )
+
+
+def _sha256(path, length):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while length > 0:
+            chunk = f.read(min(length, 1 << 20))
+            if not chunk:
+                break
+            digest.update(chunk)
+            length -= len(chunk)
+    return digest.hexdigest()
+
+
+def _ids_sha256(ids):
+    return hashlib.sha256("\n".join(map(str, ids)).encode("utf-8")).hexdigest()
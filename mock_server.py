@@ -0,0 +1,428 @@
+"""本地模拟的 GraphQL Likes 接口，用于离线测试与性能基准。
+
+生成与线上一致的 ``data.user.result.timeline.timeline.instructions[0].entries``
+结构：普通推文、TweetWithVisibilityResults、引用（含墓碑引用）、转推、
+图片与视频媒体、时间线中的墓碑条目以及首尾游标。每条点赞由其序号和种子
+确定性生成，任意页可独立生成，模拟 50 万点赞的账号也不占额外内存。
+
+同时提供 TweetResultsByRestIds 批量查询接口。还可注入延迟、随机 429/5xx 以及 x-rate-limit-* 速率限制::
+
+    python mock_server.py --likes 100000 --latency 0.05 --rate-limit 500 --window 60
+
+然后将 config.yaml 中的 ``likes_url`` 指向打印出的地址。
+"""
+
+import base64
+import json
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from time_util import TWITTER_EPOCH_MS, snowflake_to_ms
+
+# 最新一条点赞推文的发布时间，之后的推文依次更早
+_NEWEST_MS = int(datetime(2025, 1, 1, tzinfo=timezone.utc).timestamp() * 1000)
+
+_WORDS = (
+    "the quick brown fox jumps over lazy dog archive likes timeline "
+    "今天 天气 不错 推特 点赞 备份 测试 数据 引用 转推"
+).split()
+
+
+def snowflake(ms, seq=0):
+    return str(((ms - TWITTER_EPOCH_MS) << 22) | seq)
+
+
+def _encode_cursor(offset):
+    return base64.b64encode(f"likes-offset:{offset}".encode()).decode()
+
+
+def _decode_cursor(cursor):
+    if not cursor:
+        return 0
+    return int(base64.b64decode(cursor).decode().rsplit(":", 1)[1])
+
+
+class LikesTimeline:
+    """确定性生成某个账号的点赞时间线。"""
+
+    def __init__(self, likes=1000, seed=0):
+        self.likes = likes
+        self.seed = seed
+
+    def page(self, cursor=None, count=20):
+        offset = _decode_cursor(cursor)
+        end = min(self.likes, offset + count)
+        entries = [self.entry(i) for i in range(offset, end)]
+        entries.append(self._cursor_entry("Top", _encode_cursor(0)))
+        # 到达末尾时返回与请求相同的底部游标，客户端据此结束
+        bottom = _encode_cursor(end) if end > offset else cursor
+        entries.append(self._cursor_entry("Bottom", bottom))
+        return {
+            "data": {
+                "user": {
+                    "result": {
+                        "timeline": {
+                            "timeline": {
+                                "instructions": [
+                                    {"type": "TimelineAddEntries", "entries": entries}
+                                ]
+                            }
+                        }
+                    }
+                }
+            }
+        }
+
+    def entry(self, index):
+        rng = random.Random(self.seed * 1_000_003 + index)
+        tweet_ms = _NEWEST_MS - index * 3_600_000 - rng.randrange(3_600_000)
+        tweet_id = snowflake(tweet_ms, index % 4096)
+
+        roll = rng.random()
+        if roll < 0.01:
+            result = {
+                "__typename": "TweetTombstone",
+                "tombstone": {"text": {"text": "This Post is unavailable."}},
+            }
+        else:
+            result = self._tweet(rng, tweet_id, tweet_ms)
+            if roll < 0.15:
+                quoted = self._tweet(rng, *self._older(rng, tweet_ms))
+                self._attach_quote(result, quoted, rng)
+            elif roll < 0.20:
+                self._attach_tombstone_quote(result, rng, tweet_ms)
+            elif roll < 0.30:
+                retweeted = self._tweet(rng, *self._older(rng, tweet_ms))
+                result["legacy"]["retweeted_status_result"] = {"result": retweeted}
+            if rng.random() < 0.1:
+                result = {"__typename": "TweetWithVisibilityResults", "tweet": result}
+        return {
+            "entryId": f"tweet-{tweet_id}",
+            "sortIndex": str(10**18 - index),
+            "content": {
+                "entryType": "TimelineTimelineItem",
+                "__typename": "TimelineTimelineItem",
+                "itemContent": {
+                    "itemType": "TimelineTweet",
+                    "__typename": "TimelineTweet",
+                    "tweet_results": {"result": result},
+                    "tweetDisplayType": "Tweet",
+                },
+            },
+        }
+
+    def tweet_by_id(self, tweet_id):
+        """TweetResultsByRestIds 的单条结果；约 10% 的 ID 模拟为已删除。"""
+        rng = random.Random(f"{self.seed}:{tweet_id}")
+        if rng.random() < 0.1:
+            return {}
+        tweet_ms = snowflake_to_ms(tweet_id)
+        return {"result": self._tweet(rng, tweet_id, tweet_ms)}
+
+    @staticmethod
+    def _older(rng, ms):
+        older_ms = ms - rng.randrange(1, 365 * 86_400_000)
+        return snowflake(older_ms, rng.randrange(4096)), older_ms
+
+    @staticmethod
+    def _cursor_entry(cursor_type, value):
+        return {
+            "entryId": f"cursor-{cursor_type.lower()}-{value}",
+            "sortIndex": "0",
+            "content": {
+                "entryType": "TimelineTimelineCursor",
+                "__typename": "TimelineTimelineCursor",
+                "value": value,
+                "cursorType": cursor_type,
+            },
+        }
+
+    def _tweet(self, rng, tweet_id, tweet_ms):
+        user_id = str(rng.randrange(10**6, 10**9))
+        screen_name = f"user{user_id[-5:]}"
+        created_at = datetime.fromtimestamp(tweet_ms / 1000, timezone.utc).strftime(
+            "%a %b %d %H:%M:%S +0000 %Y"
+        )
+        legacy = {
+            "id_str": tweet_id,
+            "user_id_str": user_id,
+            "created_at": created_at,
+            "full_text": " ".join(rng.choices(_WORDS, k=rng.randrange(3, 40))),
+            "favorite_count": rng.randrange(100_000),
+            "reply_count": rng.randrange(1_000),
+            "retweet_count": rng.randrange(10_000),
+            "quote_count": rng.randrange(1_000),
+            "in_reply_to_status_id_str": (
+                snowflake(tweet_ms - 60_000) if rng.random() < 0.1 else None
+            ),
+            "in_reply_to_screen_name": None,
+            "entities": {"hashtags": [], "urls": [], "user_mentions": []},
+        }
+        media = self._media(rng, tweet_id)
+        if media:
+            legacy["entities"]["media"] = media
+            legacy["extended_entities"] = {"media": media}
+        result = {
+            "__typename": "Tweet",
+            "rest_id": tweet_id,
+            "core": {
+                "user_results": {
+                    "result": {
+                        "__typename": "User",
+                        "rest_id": user_id,
+                        "legacy": {
+                            "screen_name": screen_name,
+                            "name": f"User {user_id[-5:]}",
+                            "profile_image_url_https": (
+                                f"https://pbs.twimg.com/profile_images/{user_id}/avatar_normal.jpg"
+                            ),
+                        },
+                    }
+                }
+            },
+            "views": {"count": str(rng.randrange(10**7)), "state": "EnabledWithCount"},
+            "legacy": legacy,
+        }
+        if rng.random() < 0.05:
+            result["note_tweet"] = {
+                "note_tweet_results": {
+                    "result": {"text": " ".join(rng.choices(_WORDS, k=120))}
+                }
+            }
+        return result
+
+    @staticmethod
+    def _media(rng, tweet_id):
+        roll = rng.random()
+        if roll < 0.6:
+            return []
+        if roll < 0.9:
+            return [
+                {
+                    "type": "photo",
+                    "media_url_https": f"https://pbs.twimg.com/media/{tweet_id}_{n}.jpg",
+                }
+                for n in range(rng.randrange(1, 5))
+            ]
+        media_type = "video" if roll < 0.97 else "animated_gif"
+        return [
+            {
+                "type": media_type,
+                "media_url_https": f"https://pbs.twimg.com/ext_tw_video_thumb/{tweet_id}/pu/img/thumb.jpg",
+                "video_info": {
+                    "variants": [
+                        {
+                            "content_type": "application/x-mpegURL",
+                            "url": f"https://video.twimg.com/ext_tw_video/{tweet_id}/pl/playlist.m3u8",
+                        },
+                        *(
+                            {
+                                "bitrate": bitrate,
+                                "content_type": "video/mp4",
+                                "url": f"https://video.twimg.com/ext_tw_video/{tweet_id}/vid/{bitrate}.mp4",
+                            }
+                            for bitrate in (256000, 832000, 2176000)
+                        ),
+                    ]
+                },
+            }
+        ]
+
+    @staticmethod
+    def _attach_quote(result, quoted, rng):
+        result["quoted_status_result"] = {"result": quoted}
+        result["legacy"]["quoted_status_id_str"] = quoted["rest_id"]
+        user = quoted["core"]["user_results"]["result"]["legacy"]["screen_name"]
+        result["legacy"]["quoted_status_permalink"] = {
+            "expanded": f"https://twitter.com/{user}/status/{quoted['rest_id']}"
+        }
+
+    def _attach_tombstone_quote(self, result, rng, tweet_ms):
+        quoted_id, _ = self._older(rng, tweet_ms)
+        result["quoted_status_result"] = {
+            "result": {
+                "__typename": "TweetTombstone",
+                "tombstone": {
+                    "__typename": "TextTombstone",
+                    "text": {"text": "This Post was deleted by the Post author."},
+                },
+            }
+        }
+        result["legacy"]["quoted_status_id_str"] = quoted_id
+        result["legacy"]["quoted_status_permalink"] = {
+            "expanded": f"https://twitter.com/deleted_user/status/{quoted_id}"
+        }
+
+
+class _RateLimitWindow:
+    def __init__(self, limit, window):
+        self.limit = limit
+        self.window = window
+        self._lock = threading.Lock()
+        self._reset_at = time.time() + window
+        self._remaining = limit
+
+    def take(self):
+        """消耗一次请求额度，返回 (是否允许, 响应头)。"""
+        with self._lock:
+            now = time.time()
+            if now >= self._reset_at:
+                self._reset_at = now + self.window
+                self._remaining = self.limit
+            allowed = self._remaining > 0
+            if allowed:
+                self._remaining -= 1
+            return allowed, {
+                "x-rate-limit-limit": str(self.limit),
+                "x-rate-limit-remaining": str(self._remaining),
+                "x-rate-limit-reset": str(int(self._reset_at)),
+            }
+
+
+class MockLikesServer:
+    """在后台线程运行的模拟 Likes 服务，可作为上下文管理器使用。"""
+
+    def __init__(
+        self,
+        likes=1000,
+        seed=0,
+        host="127.0.0.1",
+        port=0,
+        latency=0.0,
+        error_rate=0.0,
+        server_error_rate=0.0,
+        rate_limit=None,
+        window=900,
+    ):
+        self.timeline = LikesTimeline(likes, seed)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.server_error_rate = server_error_rate
+        self.rate_window = _RateLimitWindow(rate_limit, window) if rate_limit else None
+        self.stats = {"pages": 0, "errors": 0}
+        self._stats_lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/i/api/graphql/mock/Likes"
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, name="mock-likes", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if not url.path.endswith(("/Likes", "/TweetResultsByRestIds")):
+                    return self._send(404, {"errors": [{"message": "not found"}]})
+                if server.latency:
+                    time.sleep(server.latency)
+
+                headers = {}
+                if server.rate_window:
+                    allowed, headers = server.rate_window.take()
+                    if not allowed:
+                        server._count("errors")
+                        return self._send(
+                            429, {"errors": [{"message": "Rate limit exceeded"}]}, headers
+                        )
+                if server.error_rate and random.random() < server.error_rate:
+                    server._count("errors")
+                    return self._send(
+                        429, {"errors": [{"message": "Rate limit exceeded"}]}, headers
+                    )
+                if server.server_error_rate and random.random() < server.server_error_rate:
+                    server._count("errors")
+                    return self._send(503, {"errors": [{"message": "Over capacity"}]})
+
+                query = parse_qs(url.query)
+                variables = json.loads(query.get("variables", ["{}"])[0])
+                if url.path.endswith("/TweetResultsByRestIds"):
+                    results = [
+                        server.timeline.tweet_by_id(tweet_id)
+                        for tweet_id in variables.get("tweetIds", [])
+                    ]
+                    return self._send(200, {"data": {"tweetResult": results}}, headers)
+                page = server.timeline.page(
+                    variables.get("cursor"), int(variables.get("count") or 20)
+                )
+                server._count("pages")
+                self._send(200, page, headers)
+
+            def _send(self, status, body, headers=None):
+                payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve a synthetic Likes timeline")
+    parser.add_argument("--likes", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="random 429 ratio")
+    parser.add_argument("--server-error-rate", type=float, default=0.0, help="random 503 ratio")
+    parser.add_argument("--rate-limit", type=int, default=None, help="requests per window")
+    parser.add_argument("--window", type=int, default=900, help="rate limit window seconds")
+    args = parser.parse_args()
+
+    mock = MockLikesServer(
+        likes=args.likes,
+        seed=args.seed,
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        server_error_rate=args.server_error_rate,
+        rate_limit=args.rate_limit,
+        window=args.window,
+    )
+    print(f"Mock Likes endpoint: {mock.url}")
+    try:
+        mock._httpd.serve_forever()
+    except KeyboardInterrupt:
+        mock._httpd.server_close()
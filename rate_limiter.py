@@ -0,0 +1,139 @@
+import logging
+import random
+import threading
+import time
+from datetime import datetime
+
+import httpx as requests
+
+_logger = logging.getLogger(__name__)
+
+
+class RateLimitedClient:
+    """按 x-rate-limit-* 响应头调度请求的 httpx.Client 包装。
+
+    - 以令牌桶记账：每次请求消耗一个令牌，令牌数以服务端返回的
+      ``x-rate-limit-remaining`` 为准
+    - 令牌耗尽时精确休眠到 ``x-rate-limit-reset`` 指示的窗口重置时刻
+    - 遇到 429 / 5xx / 网络错误时指数退避（带抖动）后重试
+    """
+
+    # 窗口重置时刻的余量，避免本地与服务端时钟误差
+    reset_margin = 1.0
+
+    def __init__(
+        self,
+        client: requests.Client,
+        max_retries: int = 5,
+        backoff_base: float = 2.0,
+        backoff_max: float = 300.0,
+    ):
+        self._client = client
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._lock = threading.Lock()
+        self.limit = None
+        self.tokens = None
+        self.reset_at = None
+
+    @property
+    def budget(self) -> str:
+        if self.tokens is None:
+            return "未知"
+        reset = (
+            datetime.fromtimestamp(self.reset_at).strftime("%H:%M:%S")
+            if self.reset_at
+            else "?"
+        )
+        return f"{self.tokens}/{self.limit}，{reset} 重置"
+
+    def get(self, url, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def request(self, method, url, **kwargs) -> requests.Response:
+        attempt = 0
+        while True:
+            self._acquire()
+            try:
+                response = self._client.request(method, url, **kwargs)
+            except requests.TransportError as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                _logger.warning(
+                    f"请求失败（{type(e).__name__}: {e}），{delay:.1f} 秒后重试"
+                )
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            self._update(response)
+            status = response.status_code
+            if status != 429 and status < 500:
+                return response
+            if attempt >= self.max_retries:
+                response.raise_for_status()
+
+            delay = self._retry_delay(response, attempt)
+            _logger.warning(
+                f"HTTP {status}，第 {attempt + 1} 次重试将在 {delay:.1f} 秒后进行"
+                f"（剩余额度 {self.budget}）"
+            )
+            time.sleep(delay)
+            attempt += 1
+
+    def close(self):
+        self._client.close()
+
+    def _acquire(self):
+        with self._lock:
+            if self.tokens is None or self.tokens > 0:
+                if self.tokens is not None:
+                    self.tokens -= 1
+                return
+            if self.reset_at is None:
+                # 窗口重置后还没有收到新的额度信息，无从得知何时重置，交由退避处理
+                self.tokens = None
+                return
+            wait = self.reset_at - time.time() + self.reset_margin
+            if wait > 0:
+                _logger.info(f"请求额度已用尽，等待 {wait:.0f} 秒至窗口重置")
+                time.sleep(wait)
+            # 新窗口：令牌重新装满
+            self.tokens = (self.limit or 1) - 1
+            self.reset_at = None
+
+    def _update(self, response):
+        headers = response.headers
+        remaining = headers.get("x-rate-limit-remaining")
+        if remaining is None:
+            return
+        with self._lock:
+            try:
+                self.tokens = int(remaining)
+                self.limit = int(headers.get("x-rate-limit-limit", self.limit or 0))
+                self.reset_at = float(headers.get("x-rate-limit-reset", 0)) or None
+            except ValueError:
+                return
+            if self.reset_at is None:
+                # 没有重置时间时无法精确等待，交由退避处理
+                self.tokens = None
+        _logger.debug(f"速率限制额度：{self.budget}")
+
+    def _retry_delay(self, response, attempt):
+        if retry_after := response.headers.get("retry-after"):
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        if response.status_code == 429 and self.reset_at:
+            wait = self.reset_at - time.time() + self.reset_margin
+            if wait > 0:
+                return wait
+        return self._backoff(attempt)
+
+    def _backoff(self, attempt):
+        delay = min(self.backoff_max, self.backoff_base * 2**attempt)
+        return delay / 2 + random.uniform(0, delay / 2)
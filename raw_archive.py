@@ -0,0 +1,72 @@
+import gzip
+import json
+import logging
+import threading
+from pathlib import Path
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖
+    zstandard = None
+
+_logger = logging.getLogger(__name__)
+
+_SUFFIXES = {"gzip": ".json.gz", "zstd": ".json.zst"}
+
+
+class RawPageArchive:
+    """按页保存 Likes 接口的原始响应，供离线重新解析。
+
+    每次抓取一个目录，每页一个压缩文件，内容为
+    ``{"cursor": 请求所用游标, "fetched_at": 抓取时间, "response": 原始响应}``。
+    """
+
+    def __init__(self, directory, compression="gzip"):
+        if compression == "zstd" and zstandard is None:
+            _logger.warning("未安装 zstandard，原始响应改用 gzip 压缩")
+            compression = "gzip"
+        if compression not in _SUFFIXES:
+            raise ValueError(f"不支持的压缩格式：{compression}")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.compression = compression
+        self._lock = threading.Lock()
+        # 恢复抓取时沿用同一目录，页号接着已有文件继续
+        self._page = len(list(iter_page_files(self.directory)))
+
+    def save(self, cursor, raw_data, fetched_at):
+        with self._lock:
+            self._page += 1
+            page = self._page
+        path = self.directory / f"page-{page:05d}{_SUFFIXES[self.compression]}"
+        record = {"cursor": cursor, "fetched_at": fetched_at, "response": raw_data}
+        payload = json.dumps(record, ensure_ascii=False).encode("utf-8")
+        if self.compression == "zstd":
+            payload = zstandard.ZstdCompressor().compress(payload)
+        else:
+            payload = gzip.compress(payload)
+        tmp_path = path.with_name(f"{path.name}.tmp")
+        tmp_path.write_bytes(payload)
+        tmp_path.replace(path)
+        return path
+
+
+def iter_page_files(directory):
+    """按页号顺序列出目录中的原始响应文件。"""
+    return sorted(
+        p
+        for suffix in _SUFFIXES.values()
+        for p in Path(directory).glob(f"page-*{suffix}")
+    )
+
+
+def load_page(path):
+    path = Path(path)
+    data = path.read_bytes()
+    if path.name.endswith(_SUFFIXES["zstd"]):
+        if zstandard is None:
+            raise RuntimeError(f"读取 {path} 需要安装 zstandard")
+        data = zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    else:
+        data = gzip.decompress(data)
+    return json.loads(data)
@@ -0,0 +1,97 @@
+"""离线重放：将 raw_pages/ 中保存的原始 Likes 响应重新解析为备份文件。
+
+解析器新增字段后，无需重新抓取即可回填整个归档::
+
+    python replay.py                 # 重放全部抓取记录
+    python replay.py raw_pages/2025-01-01_00-00-00_+0000 --workers 8
+
+每个抓取目录输出一个 ``liked_tweets.replay-<目录名>.json``，
+之后照常运行 merge_and_download.py 合并即可。
+"""
+
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from config import account_configs, config
+from download_tweets import TweetDownloader
+from raw_archive import iter_page_files, load_page
+from tweet_record import parse_entry
+
+_logger = logging.getLogger(__name__)
+
+
+def parse_page_file(path):
+    """解析单个原始响应文件，返回 (抓取时间, 推文列表)。"""
+    page = load_page(path)
+    tweets = []
+    for raw_tweet in TweetDownloader.extract_likes_entries(page["response"]):
+        try:
+            data_type, record = parse_entry(raw_tweet)
+            if data_type == "tweet":
+                tweets.append(record.as_json())
+        except KeyError:
+            _logger.error(f"{path}: raw_tweet json解析失败")
+    return page["fetched_at"], tweets
+
+
+def replay_run(run_dir, executor, cfg=config):
+    page_files = iter_page_files(run_dir)
+    if not page_files:
+        _logger.info(f"{run_dir}: 没有原始响应文件")
+        return None
+
+    backup_time = None
+    seen_ids = set()
+    tweets = []
+    # map 保持页序，各页在进程池中并行解析
+    for fetched_at, page_tweets in executor.map(parse_page_file, page_files):
+        backup_time = backup_time or fetched_at
+        for tweet in page_tweets:
+            if tweet["tweet_id"] not in seen_ids:
+                seen_ids.add(tweet["tweet_id"])
+                tweets.append(tweet)
+
+    output_file = cfg["site_path"] / (
+        f"{cfg['output_json_path'].stem}.replay-{Path(run_dir).name}.json"
+    )
+    backup_data = {
+        "backup_time": backup_time,
+        "tweet_count": len(tweets),
+        "tweets": tweets,
+    }
+    output_file.write_text(
+        json.dumps(backup_data, ensure_ascii=False, indent=2), encoding="utf-8"
+    )
+    _logger.info(
+        f"{run_dir}: 重放 {len(page_files)} 页，{len(tweets)} 条推文已写入 {output_file}"
+    )
+    return output_file
+
+
+def replay(run_dirs=None, workers=None, cfg=config):
+    raw_root = cfg["site_path"] / "raw_pages"
+    if not run_dirs:
+        run_dirs = sorted(p for p in raw_root.glob("*") if p.is_dir())
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        return [replay_run(Path(d), executor, cfg) for d in run_dirs]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Re-parse archived raw Likes responses without network access"
+    )
+    parser.add_argument(
+        "run_dirs", nargs="*", help="raw_pages/<run> directories (default: all)"
+    )
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    if args.run_dirs:
+        replay(args.run_dirs, args.workers)
+    else:
+        for account_cfg in account_configs():
+            replay(workers=args.workers, cfg=account_cfg)
@@ -0,0 +1,225 @@
+"""站内搜索索引：建站时生成按词项前缀分片的倒排索引，由 static/search.js 按需载入。
+
+索引的内容包括推文正文、用户名、昵称，以及引用和转推的正文。
+分词时先做 NFKC 规范化并转为小写，再去掉链接：
+
+- 中日韩文字连续的部分切成相邻两字的二元组，最后一个字另外作为单字收录，
+  这样每个字都是某个词项的开头，单字查询按前缀即可找到；
+- 其他字母与数字连续的部分作为一个词，单个字母不收录。
+
+索引文件写在站点的 ``search/`` 目录，均为调用 ``searchIndex.load(name, data)``
+的脚本，直接打开本地文件（file://）时也能按需加载：
+
+- ``manifest.js``：推文总数、每个文档块的条数，以及各词项分片的首个词项；
+- ``terms-N.js``：按词项排序后切分的分片，``{词项: 推文序号的差值编码}``；
+- ``docs-N.js``：每 DOC_CHUNK_SIZE 条一块，保存结果列表显示所需的字段。
+
+推文从最旧的一条开始编号，新增点赞只改动包含新词项的分片与最后一个文档块。
+词项按 UTF-16 编码顺序排序，与浏览器中字符串比较的结果一致。
+查询时按二分查找确定词项所在分片，单个汉字或末尾未输完的词按前缀查找相邻分片。
+各页面的内容哈希都未变化时不重新分词；需要分词时可交给建站的进程池并行完成。
+"""
+
+import hashlib
+import json
+import logging
+import re
+import unicodedata
+from pathlib import Path
+
+from time_util import format_epoch_ms
+
+_logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 2
+SEARCH_DIRNAME = "search"
+DOC_CHUNK_SIZE = 100
+# 每个词项分片的目标大小（字节）
+SHARD_TARGET_BYTES = 64 * 1024
+SNIPPET_LENGTH = 140
+# 并行分词时每个任务的推文条数
+TOKENIZE_CHUNK_SIZE = 2000
+
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af"
+_URL_RE = re.compile(r"https?://\S+")
+_TOKEN_RE = re.compile(rf"([{_CJK}]+)|((?:(?![{_CJK}])[^\W_])+)")
+
+
+def tokenize(text):
+    """返回文本中的词项集合。
+
+    static/search.js 中的 parseQuery 按相同规则切分查询，只是不额外收录末字。
+    """
+    text = _URL_RE.sub(" ", unicodedata.normalize("NFKC", text).lower())
+    terms = set()
+    for cjk, word in _TOKEN_RE.findall(text):
+        if cjk:
+            terms.update(map(str.__add__, cjk, cjk[1:]))
+            terms.add(cjk[-1])
+        elif len(word) > 1:
+            terms.add(word)
+    return terms
+
+
+def chunk_postings(texts):
+    """对一块推文分词，返回 {词项: 块内序号列表}，供进程池按块调用。"""
+    postings_by_term = {}
+    for doc_num, text in enumerate(texts):
+        for term in tokenize(text):
+            postings = postings_by_term.get(term)
+            if postings is None:
+                postings_by_term[term] = [doc_num]
+            else:
+                postings.append(doc_num)
+    return postings_by_term
+
+
+def page_entries(filename, page_tweets):
+    """返回页面中各推文的 (结果列表字段, 待分词文本)。
+
+    推文需已由 add_epoch_ms 补齐时间戳；建站时在渲染页面的进程中调用。
+    """
+    entries = []
+    for tweet in page_tweets:
+        content = tweet.get("tweet_content") or tweet.get("tombstone") or ""
+        doc = [
+            tweet.get("tweet_id"),
+            tweet.get("user_name"),
+            tweet.get("user_nick"),
+            tweet.get("tweet_created_at_ms"),
+            filename,
+            content[:SNIPPET_LENGTH],
+        ]
+        entries.append((doc, _text(tweet)))
+    return entries
+
+
+def _text(tweet):
+    parts = [
+        tweet.get("tweet_content"),
+        tweet.get("user_name"),
+        tweet.get("user_nick"),
+    ]
+    for key in ("quoted_tweet", "retweeted_tweet"):
+        if nested := tweet.get(key):
+            parts.append(nested.get("tweet_content"))
+    return "\n".join(part for part in parts if part)
+
+
+def _utf16_key(term):
+    return term.encode("utf-16-be")
+
+
+class SearchIndexBuilder:
+    """按合并顺序（从新到旧）接收各页推文，最后写出索引文件。"""
+
+    def __init__(self, cfg):
+        self.timezone = cfg["timezone"]
+        self.search_dir = Path(cfg["site_path"], SEARCH_DIRNAME)
+        self.docs = []
+        self.texts = []
+        self._digest = hashlib.sha256(f"{INDEX_VERSION}\n".encode("utf-8"))
+
+    def add_page(self, filename, entries, page_hash):
+        """entries 为 page_entries 的结果；page_hash 为页面内容的哈希，涵盖索引用到的全部字段。"""
+        self._digest.update(f"{filename}\0{page_hash}\n".encode("utf-8"))
+        for doc, text in entries:
+            self.docs.append(doc)
+            self.texts.append(text)
+
+    def write(self, map_fn=map):
+        """写出索引；内容未变化的文件不重写，不再使用的文件被删除。
+
+        map_fn 用于按块调用 chunk_postings，传入进程池的 map 即可并行分词。
+        """
+        build = self._digest.hexdigest()[:12]
+        manifest_path = self.search_dir / "manifest.js"
+        if _read_script(manifest_path).get("build") == build:
+            _logger.info("搜索索引未变化")
+            return
+        self.search_dir.mkdir(exist_ok=True)
+        # 从最旧的推文开始编号
+        docs = self.docs[::-1]
+        for doc in docs:
+            doc[3] = "" if doc[3] is None else format_epoch_ms(doc[3], self.timezone)
+        texts = self.texts[::-1]
+        chunks = [
+            texts[i : i + TOKENIZE_CHUNK_SIZE]
+            for i in range(0, len(texts), TOKENIZE_CHUNK_SIZE)
+        ]
+        postings_by_term = {}
+        for i, chunk in enumerate(map_fn(chunk_postings, chunks)):
+            start = i * TOKENIZE_CHUNK_SIZE
+            for term, local in chunk.items():
+                postings = postings_by_term.get(term)
+                if postings is None:
+                    postings = postings_by_term[term] = []
+                postings.extend([start + n for n in local] if start else local)
+
+        files = {}
+        for i in range(0, len(docs), DOC_CHUNK_SIZE):
+            files[f"docs-{i // DOC_CHUNK_SIZE}"] = docs[i : i + DOC_CHUNK_SIZE]
+
+        shard_starts = []
+        shard, shard_bytes = {}, 0
+        for term in sorted(postings_by_term, key=_utf16_key):
+            postings = postings_by_term[term]
+            # 推文序号递增，保存相邻序号的差值
+            deltas = [postings[0]] + [b - a for a, b in zip(postings, postings[1:])]
+            if shard and shard_bytes >= SHARD_TARGET_BYTES:
+                files[f"terms-{len(shard_starts) - 1}"] = shard
+                shard, shard_bytes = {}, 0
+            if not shard:
+                shard_starts.append(term)
+            shard[term] = deltas
+            shard_bytes += len(term) + 4 * len(deltas) + 6
+        if shard:
+            files[f"terms-{len(shard_starts) - 1}"] = shard
+
+        contents = {name: _script(name, data) for name, data in files.items()}
+        # 分片地址附带 build，浏览器不会用到缓存中的旧分片
+        contents["manifest"] = _script(
+            "manifest",
+            {
+                "version": INDEX_VERSION,
+                "build": build,
+                "docs": len(docs),
+                "doc_chunk": DOC_CHUNK_SIZE,
+                "shards": shard_starts,
+            },
+        )
+
+        written = 0
+        for name, content in contents.items():
+            path = self.search_dir / f"{name}.js"
+            try:
+                if path.read_text(encoding="utf-8") == content:
+                    continue
+            except OSError:
+                pass
+            tmp_path = path.with_name(f"{path.name}.tmp")
+            tmp_path.write_text(content, encoding="utf-8")
+            tmp_path.replace(path)
+            written += 1
+        for path in self.search_dir.glob("*.js"):
+            if path.stem not in contents:
+                path.unlink()
+        _logger.info(
+            f"搜索索引：{len(docs)} 条推文，{len(postings_by_term)} 个词项，"
+            f"{len(shard_starts)} 个分片（更新 {written} 个文件）"
+        )
+
+
+def _script(name, data):
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return f"searchIndex.load({json.dumps(name)},{payload});\n"
+
+
+def _read_script(path):
+    """读取 _script 写出的文件中的数据；不存在或无法解析时返回空字典。"""
+    try:
+        text = path.read_text(encoding="utf-8")
+        data = json.loads(text[text.index(",") + 1 : text.rindex(")")])
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
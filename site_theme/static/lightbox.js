@@ -249,9 +249,10 @@
     e.preventDefault();
     e.stopPropagation();
     const wrapper = imgEl.closest('.tweet_images_wrapper');
-    const items = Array.from(wrapper.querySelectorAll('img')).map((i) => i.src);
-    const i = items.indexOf(imgEl.src);
-    show(items, i);
+    // 页面上是缩略图，灯箱打开 data-full 指向的原图
+    const imgs = Array.from(wrapper.querySelectorAll('img'));
+    const items = imgs.map((i) => i.dataset.full || i.src);
+    show(items, imgs.indexOf(imgEl));
   }
 
   // 点击图片时按 原图 -> 50%/75%/100%（仅选择大于原图的级别）循环
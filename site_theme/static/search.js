@@ -0,0 +1,223 @@
+(function () {
+  // 索引目录由 search.html 中的 data-index 指定，文件格式见 search_index.py
+  const base = document.currentScript.dataset.index;
+  const CJK = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af';
+  const URL_RE = /https?:\/\/\S+/g;
+  const TOKEN_RE = new RegExp(`([${CJK}]+)|((?:(?![${CJK}])[\\p{L}\\p{N}])+)`, 'gu');
+  const RESULTS_PER_PAGE = 20;
+
+  const form = document.querySelector('.search_form');
+  const input = form.querySelector('input[name=q]');
+  const status = document.querySelector('.search_status');
+  const list = document.querySelector('.search_results');
+  const more = document.querySelector('.search_more');
+
+  // 索引文件是调用 searchIndex.load(name, data) 的脚本，file:// 下也能载入
+  const requests = {};
+  window.searchIndex = {
+    load(name, data) {
+      if (requests[name]) requests[name].resolve(data);
+    },
+  };
+
+  function load(name, version) {
+    if (!requests[name]) {
+      const request = {};
+      request.promise = new Promise((resolve, reject) => {
+        request.resolve = resolve;
+        const el = document.createElement('script');
+        el.src = `${base}${name}.js?v=${version}`;
+        el.onerror = () => {
+          delete requests[name];
+          reject(new Error(`Failed to load search index file ${name}.js`));
+        };
+        document.head.appendChild(el);
+      });
+      requests[name] = request;
+    }
+    return requests[name].promise;
+  }
+
+  // 与 search_index.tokenize 相同的分词；单个汉字与末尾未输完的词按前缀查找
+  function parseQuery(text) {
+    const normalized = text.normalize('NFKC').toLowerCase().replace(URL_RE, ' ');
+    const terms = [];
+    const matches = [...normalized.matchAll(TOKEN_RE)];
+    const open = !/\s$/.test(text);
+    matches.forEach((m, i) => {
+      const isLast = i === matches.length - 1;
+      if (m[1]) {
+        const run = m[1];
+        if (run.length === 1) {
+          terms.push({ term: run, prefix: true });
+        } else {
+          for (let j = 0; j < run.length - 1; j++) {
+            terms.push({ term: run.slice(j, j + 2), prefix: false });
+          }
+        }
+      } else if (m[2].length > 1) {
+        terms.push({ term: m[2], prefix: isLast && open });
+      }
+    });
+    return terms;
+  }
+
+  function shardOf(shards, term) {
+    // 最后一个首词项不大于 term 的分片
+    let lo = 0;
+    let hi = shards.length - 1;
+    while (lo < hi) {
+      const mid = (lo + hi + 1) >> 1;
+      if (shards[mid] <= term) lo = mid;
+      else hi = mid - 1;
+    }
+    return lo;
+  }
+
+  function decode(deltas) {
+    const docs = new Array(deltas.length);
+    let n = 0;
+    for (let i = 0; i < deltas.length; i++) {
+      n += deltas[i];
+      docs[i] = n;
+    }
+    return docs;
+  }
+
+  async function postings(manifest, { term, prefix }) {
+    const { shards, build } = manifest;
+    if (!shards.length) return [];
+    const first = shardOf(shards, term);
+    const last = prefix ? shardOf(shards, term + '\uffff') : first;
+    const loaded = [];
+    for (let i = first; i <= last; i++) loaded.push(load(`terms-${i}`, build));
+    const found = [];
+    for (const shard of await Promise.all(loaded)) {
+      if (!prefix) {
+        if (Object.hasOwn(shard, term)) found.push(decode(shard[term]));
+        continue;
+      }
+      for (const key in shard) {
+        if (key.startsWith(term)) found.push(decode(shard[key]));
+      }
+    }
+    if (found.length === 1) return found[0];
+    return [...new Set(found.flat())].sort((a, b) => a - b);
+  }
+
+  function intersect(a, b) {
+    const out = [];
+    let i = 0;
+    let j = 0;
+    while (i < a.length && j < b.length) {
+      if (a[i] === b[j]) {
+        out.push(a[i]);
+        i++;
+        j++;
+      } else if (a[i] < b[j]) {
+        i++;
+      } else {
+        j++;
+      }
+    }
+    return out;
+  }
+
+  let manifestPromise = null;
+  let current = { seq: 0, docs: [], shown: 0, manifest: null };
+
+  async function search(text) {
+    const seq = current.seq + 1;
+    current = { seq, docs: [], shown: 0, manifest: null };
+    list.replaceChildren();
+    more.hidden = true;
+    const terms = parseQuery(text);
+    if (!terms.length) {
+      status.textContent = '';
+      return;
+    }
+    status.textContent = 'Searching…';
+    try {
+      manifestPromise =
+        manifestPromise ||
+        load('manifest', Date.now()).catch((e) => {
+          manifestPromise = null;
+          throw e;
+        });
+      const manifest = await manifestPromise;
+      const lists = await Promise.all(terms.map((t) => postings(manifest, t)));
+      if (seq !== current.seq) return;
+      lists.sort((a, b) => a.length - b.length);
+      // 推文从最旧的一条开始编号，结果按从新到旧显示
+      const docs = lists.reduce((acc, l) => intersect(acc, l)).reverse();
+      current.docs = docs;
+      current.manifest = manifest;
+      status.textContent = `${docs.length} result${docs.length === 1 ? '' : 's'}`;
+      await showMore();
+    } catch (e) {
+      if (seq === current.seq) status.textContent = e.message;
+    }
+  }
+
+  async function showMore() {
+    const { seq, docs, manifest } = current;
+    more.hidden = true;
+    const slice = docs.slice(current.shown, current.shown + RESULTS_PER_PAGE);
+    const chunks = await Promise.all(
+      slice.map((n) => load(`docs-${Math.floor(n / manifest.doc_chunk)}`, manifest.build))
+    );
+    if (seq !== current.seq) return;
+    slice.forEach((n, i) => list.appendChild(card(chunks[i][n % manifest.doc_chunk])));
+    current.shown += slice.length;
+    more.hidden = current.shown >= docs.length;
+  }
+
+  function el(tag, className, text) {
+    const node = document.createElement(tag);
+    if (className) node.className = className;
+    if (text) node.textContent = text;
+    return node;
+  }
+
+  function card([tweetId, userName, userNick, createdAt, page, snippet]) {
+    const wrapper = el('div', 'tweet_wrapper');
+    const author = el('div', 'author_context');
+    const handle = el('div', 'tweet_author_handle');
+    const profile = el('a', null, `@${userName || ''}`);
+    profile.href = `https://www.twitter.com/${encodeURIComponent(userName || '')}/`;
+    profile.target = '_blank';
+    handle.appendChild(profile);
+    author.append(handle, el('div', 'tweet_author_name', userNick));
+    const content = el('div', 'tweet_content');
+    content.appendChild(el('span', null, snippet));
+    const link = el('div', 'twitter_link');
+    const anchor = el('a', null, 'View in archive');
+    anchor.href = `${encodeURI(page)}#tweet-${tweetId}`;
+    link.appendChild(anchor);
+    wrapper.append(author, content, el('div', 'tweet_created_at', createdAt), link);
+    return wrapper;
+  }
+
+  let timer = 0;
+  input.addEventListener('input', () => {
+    clearTimeout(timer);
+    timer = setTimeout(() => {
+      const url = new URL(location.href);
+      url.searchParams.set('q', input.value);
+      history.replaceState(null, '', url);
+      search(input.value);
+    }, 150);
+  });
+  form.addEventListener('submit', (e) => {
+    e.preventDefault();
+    clearTimeout(timer);
+    search(input.value);
+  });
+  more.querySelector('button').addEventListener('click', showMore);
+
+  const initial = new URLSearchParams(location.search).get('q');
+  if (initial) {
+    input.value = initial;
+    search(initial);
+  }
+})();
@@ -0,0 +1,194 @@
+"""为站点生成缩小的图片与头像。
+
+原图保留在 ``media/`` 中供灯箱查看，页面上的 ``<img>`` 改用
+``media/thumbs/`` 下的缩略图（``srcset`` 按宽度选择）。``media/thumbs/index.json``
+记录每个原图的大小、修改时间与已生成的缩略图；原图未变化时不会重新生成。
+内容相同的硬链接文件（见 media_store）只生成一次。
+
+需要安装 Pillow；未安装时跳过，页面继续直接使用原图。
+"""
+
+import json
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from urllib.parse import quote
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:
+    Image = None
+
+_logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+THUMBS_DIRNAME = "thumbs"
+_PHOTO_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp"}
+_FORMATS = {"webp": ("WEBP", ".webp"), "jpeg": ("JPEG", ".jpg")}
+
+
+def pool_context():
+    """进程池的启动方式。
+
+    多账号同步时合并与建站在线程中运行，fork 时其他线程可能正持有日志、
+    httpx 或 sqlite 的锁，子进程会因此死锁；可用时改用 forkserver，否则用 spawn。
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+def _render(src, thumbs_dir, widths, image_format, suffix, quality):
+    """工作进程：生成小于原图宽度的各个缩略图，返回 (原图宽度, {宽度: 文件名})。"""
+    made = {}
+    try:
+        with Image.open(src) as im:
+            im = ImageOps.exif_transpose(im)
+            width = im.width
+            if image_format == "JPEG" and im.mode not in ("RGB", "L"):
+                im = im.convert("RGB")
+            for w in widths:
+                if w >= width:
+                    continue
+                thumb = im.copy()
+                thumb.thumbnail((w, w * 10), Image.LANCZOS)
+                name = f"{src.name}.{w}{suffix}"
+                tmp_path = thumbs_dir / f"{name}.tmp"
+                thumb.save(tmp_path, image_format, quality=quality)
+                tmp_path.replace(thumbs_dir / name)
+                made[str(w)] = name
+    except Exception as e:
+        # 损坏或不支持的图片只记录，原图不变时不再重试
+        _logger.warning(f"{src.name}: 缩略图生成失败：{e}")
+        return None, {}
+    return width, made
+
+
+def generate_thumbnails(cfg):
+    """为 media/ 中新增或变化的图片生成缩略图，更新索引。"""
+    if Image is None:
+        _logger.warning("未安装 Pillow，跳过缩略图生成")
+        return
+    media_dir = Path(cfg["site_path"], "media")
+    if not media_dir.is_dir():
+        return
+    thumbs_dir = media_dir / THUMBS_DIRNAME
+    thumbs_dir.mkdir(exist_ok=True)
+
+    format_name = cfg.get("thumbnail_format", "webp")
+    if format_name == "webp" and not features.check("webp"):
+        _logger.warning("Pillow 不支持 WebP，缩略图改用 JPEG")
+        format_name = "jpeg"
+    image_format, suffix = _FORMATS[format_name]
+    widths = sorted(cfg.get("thumbnail_widths") or [400, 800])
+    avatar_widths = [cfg.get("avatar_thumbnail_size", 96)]
+    quality = cfg.get("thumbnail_quality", 80)
+    settings = {"format": format_name, "widths": widths, "avatar": avatar_widths}
+
+    index_path = thumbs_dir / "index.json"
+    index = _read_index(index_path)
+    files = index["files"] if index.get("settings") == settings else {}
+
+    # 同一 inode 只处理一次；其余文件名共用结果
+    current, jobs, shared = {}, {}, {}
+    with os.scandir(media_dir) as entries:
+        for entry in entries:
+            if not entry.is_file() or Path(entry.name).suffix.lower() not in _PHOTO_SUFFIXES:
+                continue
+            stat = entry.stat()
+            current[entry.name] = (stat.st_mtime_ns, stat.st_size)
+            old = files.get(entry.name)
+            if old and (old["mtime_ns"], old["size"]) == current[entry.name]:
+                continue
+            inode = (stat.st_dev, stat.st_ino)
+            if inode in jobs:
+                shared.setdefault(inode, []).append(entry.name)
+                continue
+            is_avatar = entry.name.startswith("avatar_")
+            jobs[inode] = (entry.name, avatar_widths if is_avatar else widths)
+
+    files = {name: entry for name, entry in files.items() if name in current}
+    if jobs:
+        _logger.info(f"正在为 {len(jobs)} 个图片生成缩略图...")
+        with ProcessPoolExecutor(
+            max_workers=cfg.get("thumbnail_workers"), mp_context=pool_context()
+        ) as executor:
+            futures = {
+                inode: executor.submit(
+                    _render,
+                    media_dir / name,
+                    thumbs_dir,
+                    job_widths,
+                    image_format,
+                    suffix,
+                    quality,
+                )
+                for inode, (name, job_widths) in jobs.items()
+            }
+            for inode, future in futures.items():
+                width, made = future.result()
+                for name in [jobs[inode][0], *shared.get(inode, [])]:
+                    mtime_ns, size = current[name]
+                    files[name] = {
+                        "mtime_ns": mtime_ns,
+                        "size": size,
+                        "width": width,
+                        "thumbs": made,
+                    }
+
+    _remove_unused(thumbs_dir, files)
+    tmp_path = index_path.with_name(f"{index_path.name}.tmp")
+    tmp_path.write_text(
+        json.dumps({"version": INDEX_VERSION, "settings": settings, "files": files}),
+        encoding="utf-8",
+    )
+    tmp_path.replace(index_path)
+    _logger.info(f"缩略图已更新：新生成 {len(jobs)} 个图片，共 {len(files)} 个")
+
+
+def _read_index(index_path):
+    try:
+        index = json.loads(index_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {"files": {}}
+    return index if index.get("version") == INDEX_VERSION else {"files": {}}
+
+
+def _remove_unused(thumbs_dir, files):
+    used = {name for entry in files.values() for name in entry["thumbs"].values()}
+    used.add("index.json")
+    with os.scandir(thumbs_dir) as entries:
+        for entry in entries:
+            if entry.name not in used:
+                os.unlink(entry.path)
+
+
+def load_thumbnails(cfg):
+    """返回 {原图文件名: 索引项}，供建站时生成 srcset；没有索引时为空。"""
+    return _read_index(
+        Path(cfg["site_path"], "media", THUMBS_DIRNAME, "index.json")
+    )["files"]
+
+
+def thumbnail_attrs(entry, filename, base_path=""):
+    """返回 {"src": 最小缩略图, "srcset": 各缩略图与原图}；没有缩略图时返回 None。"""
+    if not entry or not entry["thumbs"]:
+        return None
+    prefix = f"{base_path}media/{THUMBS_DIRNAME}/"
+    candidates = [
+        (int(w), quote(prefix + name)) for w, name in entry["thumbs"].items()
+    ]
+    candidates.sort()
+    srcset = [f"{url} {w}w" for w, url in candidates]
+    if entry.get("width"):
+        srcset.append(f"{quote(f'{base_path}media/{filename}')} {entry['width']}w")
+    return {"src": candidates[0][1], "srcset": ", ".join(srcset)}
+
+
+if __name__ == "__main__":
+    from config import account_configs
+
+    for account_cfg in account_configs():
+        generate_thumbnails(account_cfg)
@@ -1,5 +1,5 @@
 import logging
-from datetime import datetime, tzinfo
+from datetime import datetime, timedelta, timezone, tzinfo
 from enum import Enum
 from functools import lru_cache
 from typing import Optional, Union
@@ -43,9 +43,112 @@ def format_datetime(
         dt = dt.replace(tzinfo=get_tz(default_tz))
     if target_tz:
         dt = dt.astimezone(get_tz(target_tz))
+    if format is DateTimeFormat.DISPLAY:
+        return _format_display(dt)
     return dt.strftime(_get_format_str(format))
 
 
+_MONTHS = {
+    "Jan": 1,
+    "Feb": 2,
+    "Mar": 3,
+    "Apr": 4,
+    "May": 5,
+    "Jun": 6,
+    "Jul": 7,
+    "Aug": 8,
+    "Sep": 9,
+    "Oct": 10,
+    "Nov": 11,
+    "Dec": 12,
+}
+
+# 数字映射为 0、字母映射为 a，得到字符串的"形状"，同形状的字符串格式相同
+_SHAPE_TABLE = str.maketrans(
+    "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ",
+    "0" * 10 + "a" * 52,
+)
+_format_by_shape: dict[str, DateTimeFormat] = {}
+
+
+@lru_cache(maxsize=128)
+def _offset_tz(offset: str) -> tzinfo:
+    # 与 strptime 的 %z 结果一致：+0000 为 timezone.utc
+    sign = -1 if offset[0] == "-" else 1
+    delta = timedelta(hours=int(offset[1:3]), minutes=int(offset[3:5]))
+    return timezone.utc if not delta else timezone(sign * delta)
+
+
+def _parse_twitter(datetime_str: str) -> datetime:
+    # Mon Jan 15 14:30:00 +0800 2024
+    _, month, day, clock, offset, year = datetime_str.split(" ")
+    if len(clock) != 8 or len(offset) != 5 or offset[0] not in "+-":
+        raise ValueError(datetime_str)
+    return datetime(
+        int(year),
+        _MONTHS[month],
+        int(day),
+        int(clock[0:2]),
+        int(clock[3:5]),
+        int(clock[6:8]),
+        tzinfo=_offset_tz(offset),
+    )
+
+
+def _parse_display(datetime_str: str) -> datetime:
+    # 2024-01-15 14:30:00 +0800，去掉时区前的空格即为 ISO 8601
+    if (
+        len(datetime_str) != 25
+        or datetime_str[19] != " "
+        or datetime_str[20] not in "+-"
+    ):
+        raise ValueError(datetime_str)
+    return datetime.fromisoformat(datetime_str[:19] + datetime_str[20:])
+
+
+def _format_display(dt: datetime) -> str:
+    # isoformat 为 C 实现，比 strftime 快得多：2024-01-15 14:30:00+08:00
+    iso = dt.isoformat(" ", "seconds")
+    if len(iso) != 25 or dt.year < 1000:
+        return dt.strftime(DateTimeFormat.DISPLAY.value)
+    return f"{iso[:19]} {iso[19:22]}{iso[23:]}"
+
+
+_FAST_PARSERS = {
+    DateTimeFormat.TWITTER: _parse_twitter,
+    DateTimeFormat.DISPLAY: _parse_display,
+}
+
+
+def _strptime(datetime_str: str, format: Union[DateTimeFormat, str]) -> datetime:
+    fast_parser = _FAST_PARSERS.get(format)
+    if fast_parser:
+        try:
+            return fast_parser(datetime_str)
+        except (ValueError, KeyError):
+            # 非常规写法交给 strptime，由它给出标准的错误信息
+            pass
+    return datetime.strptime(datetime_str, _get_format_str(format))
+
+
+def _detect_and_parse(datetime_str: str) -> datetime:
+    shape = datetime_str.translate(_SHAPE_TABLE)
+    fmt = _format_by_shape.get(shape)
+    if fmt is not None:
+        try:
+            return _strptime(datetime_str, fmt)
+        except ValueError:
+            pass
+    for fmt in DateTimeFormat:
+        try:
+            dt = _strptime(datetime_str, fmt)
+        except ValueError:
+            continue
+        _format_by_shape[shape] = fmt
+        return dt
+    raise ValueError(f"time string '{datetime_str}' does not match any known format")
+
+
 def parse_datetime(
     datetime_str: str,
     format: Optional[str] = None,
@@ -53,22 +156,12 @@ def parse_datetime(
     target_tz: Optional[Union[str, tzinfo]] = None,
 ) -> datetime:
     # 将字符串解析为 datetime 对象。
-    
-    # 如果 format 为 None，则尝试 DateTimeFormat 中的所有格式。
+
+    # 如果 format 为 None，则按字符串形状记忆的格式解析，首次遇到的形状才逐个尝试
     if format is None:
-        for fmt in DateTimeFormat:
-            try:
-                dt = datetime.strptime(datetime_str, fmt.value)
-                break
-            except ValueError:
-                pass
-        else:
-            raise ValueError(
-                f"time string '{datetime_str}' does not match any known format"
-            )
+        dt = _detect_and_parse(datetime_str)
     else:
-        dt = datetime.strptime(datetime_str, _get_format_str(format))
-        
+        dt = _strptime(datetime_str, format)
 
     if dt.tzinfo is None:
         dt = dt.replace(tzinfo=get_tz(default_tz))
@@ -86,6 +179,12 @@ def convert_datetime_format(
     default_tz: Union[str, tzinfo] = system_tz,
     target_tz: Optional[Union[str, tzinfo]] = None,
 ) -> str:
+    # 合并与建站时同一时间字符串会被反复转换，缓存最近的结果
+    return _convert_cached(datetime_str, from_format, to_format, default_tz, target_tz)
+
+
+@lru_cache(maxsize=131072)
+def _convert_cached(datetime_str, from_format, to_format, default_tz, target_tz):
     dt = parse_datetime(
         datetime_str,
         from_format,
@@ -95,6 +194,32 @@ def convert_datetime_format(
     return format_datetime(dt, to_format)
 
 
+# 推文 ID（snowflake）高位为自该纪元起的毫秒数
+TWITTER_EPOCH_MS = 1288834974657
+
+
+def snowflake_to_ms(tweet_id: Union[str, int]) -> int:
+    return (int(tweet_id) >> 22) + TWITTER_EPOCH_MS
+
+
+@lru_cache(maxsize=131072)
+def to_epoch_ms(
+    datetime_str: str, default_tz: Union[str, tzinfo] = system_tz
+) -> int:
+    dt = parse_datetime(datetime_str, default_tz=default_tz)
+    return int(dt.timestamp()) * 1000 + dt.microsecond // 1000
+
+
+@lru_cache(maxsize=131072)
+def format_epoch_ms(
+    epoch_ms: int,
+    tz: Union[str, tzinfo] = system_tz,
+    format: Union[DateTimeFormat, str] = DateTimeFormat.DISPLAY,
+) -> str:
+    dt = datetime.fromtimestamp(epoch_ms // 1000, get_tz(tz))
+    return format_datetime(dt, format)
+
+
 def strfnow(
     tz: Union[str, tzinfo] = system_tz,
     format: Union[DateTimeFormat, str] = DateTimeFormat.DISPLAY
@@ -276,4 +401,19 @@ if __name__ == "__main__":
     formatted = format_datetime(future_date, DateTimeFormat.DISPLAY)
     print(f"   Format future date (2099-12-31): {formatted}")
 
+    # Test 8: Format memo and fast parsers
+    print("8. Testing format memo and fast parsers:")
+    for test_str in [
+        "Mon Jan 15 14:30:00 +0800 2024",
+        "Tue Jan 16 09:05:00 -0500 2024",
+        "2024-01-15 14:30:00 +0800",
+        "2024-01-15_14-30-00_+0800",
+    ]:
+        fast = parse_datetime(test_str)
+        memo_fmt = _format_by_shape[test_str.translate(_SHAPE_TABLE)]
+        slow = datetime.strptime(test_str, memo_fmt.value)
+        print(f"   '{test_str}': {fast} (matches strptime: {fast == slow})")
+    print(f"   Memoized shapes: {len(_format_by_shape)}")
+    print(f"   Conversion cache: {_convert_cached.cache_info()}")
+
     print("\n=== All tests completed ===")
@@ -1,9 +1,11 @@
 from urllib.parse import parse_qs, parse_qsl, urlencode, urlparse, urlunparse
 
-from time_util import DateTimeFormat, convert_datetime_format
+from time_util import DateTimeFormat, convert_datetime_format, to_epoch_ms
 
 
 class TweetParser:
+    """逐字段解析推文的参考实现；抓取与重放使用更快的 tweet_record.TweetRecord。"""
+
     def __init__(self, raw_tweet_json, from_keydata=False, timezone=None):
         self.data_type = "unkonwn_type"
         self._media = None
@@ -13,6 +15,8 @@ class TweetParser:
 
         if from_keydata:
             self.key_data = raw_tweet_json
+            if raw_tweet_json.get("legacy"):
+                self.data_type = "tweet"
         else:
             self.raw_tweet_json = raw_tweet_json
             if raw_tweet_json.get("content"):
@@ -31,7 +35,10 @@ class TweetParser:
                     ]["result"]
                     if self.key_data.get("__typename") == "TweetWithVisibilityResults":
                         self.key_data = self.key_data["tweet"]
-                    if self.key_data.get("legacy"):
+                    if (
+                        self.key_data.get("legacy")
+                        and self.data_type != "advertisement"
+                    ):
                         self.data_type = "tweet"
             if self.data_type != "tweet":
                 return
@@ -94,6 +101,7 @@ class TweetParser:
             "tweet_content": self.tweet_content,
             "tweet_media": self.media,
             "tweet_created_at": self.tweet_created_at,
+            "tweet_created_at_ms": self.tweet_created_at_ms,
             "quoted_tweet": self.quoted_tweet,
             "retweeted_tweet": self.retweeted_tweet,
             "view_count": self.view_count,
@@ -130,6 +138,10 @@ class TweetParser:
             target_tz="UTC",
         )
 
+    @property
+    def tweet_created_at_ms(self):
+        return to_epoch_ms(self.key_data["legacy"]["created_at"])
+
     @property
     def user_id(self):
         return self.key_data["legacy"]["user_id_str"]
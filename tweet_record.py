@@ -0,0 +1,295 @@
+"""紧凑的推文记录。
+
+``TweetParser`` 每个字段都是一个属性，序列化时要反复遍历
+``key_data["legacy"]`` 和用户数据，引用/转推还会各自构造完整的解析器。
+``TweetRecord`` 只对原始数据遍历一次，把字段存入 ``__slots__``，
+``as_json()`` 输出与 ``TweetParser.tweet_as_json()`` 完全相同的结构。
+"""
+
+import calendar
+from functools import lru_cache
+from urllib.parse import parse_qs, urlencode, urlparse
+
+from time_util import (
+    DateTimeFormat,
+    convert_datetime_format,
+    snowflake_to_ms,
+    to_epoch_ms,
+)
+
+_MONTHS = {
+    "Jan": "01",
+    "Feb": "02",
+    "Mar": "03",
+    "Apr": "04",
+    "May": "05",
+    "Jun": "06",
+    "Jul": "07",
+    "Aug": "08",
+    "Sep": "09",
+    "Oct": "10",
+    "Nov": "11",
+    "Dec": "12",
+}
+
+
+def twitter_time_to_display(created_at):
+    """``Wed Oct 10 20:19:24 +0000 2018`` -> (``2018-10-10 20:19:24 +0000``, 毫秒时间戳)。
+
+    接口返回的时间都是 UTC，直接重排字段；其他时区走通用转换。
+    """
+    parts = created_at.split(" ")
+    if len(parts) == 6 and parts[4] == "+0000" and parts[1] in _MONTHS:
+        date = f"{parts[5]}-{_MONTHS[parts[1]]}-{parts[2]}"
+        clock = parts[3]
+        epoch_s = (
+            _date_epoch_s(date)
+            + int(clock[0:2]) * 3600
+            + int(clock[3:5]) * 60
+            + int(clock[6:8])
+        )
+        return f"{date} {clock} +0000", epoch_s * 1000
+    display = convert_datetime_format(
+        created_at, to_format=DateTimeFormat.DISPLAY, target_tz="UTC"
+    )
+    return display, to_epoch_ms(display)
+
+
+@lru_cache(maxsize=65536)
+def _date_epoch_s(date):
+    return calendar.timegm((*map(int, date.split("-")), 0, 0, 0))
+
+
+_EPOCH_FIELDS = ("tweet_created_at", "updated_at", "tombstone_updated_at")
+_NESTED_FIELDS = ("quoted_tweet", "retweeted_tweet", "in_reply_to_tweet")
+
+
+def add_epoch_ms(tweet):
+    """为旧归档中的推文补上 ``*_ms`` 毫秒时间戳字段（含嵌套推文），原地修改。
+
+    缺少创建时间字符串时由推文 ID 解码。
+    """
+    for key in _EPOCH_FIELDS:
+        ms_key = f"{key}_ms"
+        if ms_key not in tweet and tweet.get(key):
+            tweet[ms_key] = to_epoch_ms(tweet[key])
+    if "tweet_created_at_ms" not in tweet and str(tweet.get("tweet_id")).isdigit():
+        tweet["tweet_created_at_ms"] = snowflake_to_ms(tweet["tweet_id"])
+    for key in _NESTED_FIELDS:
+        if nested := tweet.get(key):
+            add_epoch_ms(nested)
+    return tweet
+
+
+def merge_versions(node_tweet, rival_tweet):
+    """合并同一推文的两个版本，返回 (较新版本, 是否不同于 node_tweet)。
+
+    较新的 updated_at 胜出；一侧只有墓碑引文而另一侧有完整引文时合并引文。
+    """
+    changed = False
+
+    # 保持 node_tweet 为较新版本
+    if rival_tweet["updated_at_ms"] > node_tweet["updated_at_ms"]:
+        node_tweet, rival_tweet = rival_tweet, node_tweet
+        changed = True
+
+    # 合并墓碑引文
+    node_quote = node_tweet.get("quoted_tweet")
+    rival_quote = rival_tweet.get("quoted_tweet")
+
+    if not node_quote:
+        if rival_quote:
+            node_tweet["quoted_tweet"] = rival_quote
+            changed = True
+    elif "tombstone" in node_quote and rival_quote and "tweet_content" in rival_quote:
+        # 节点有墓碑信息，另一侧有完整引文，合并较新引文
+        node_q_updated = node_quote.get("updated_at_ms", 0)
+        rival_q_updated = rival_quote.get("updated_at_ms", rival_tweet["updated_at_ms"])
+        if rival_q_updated > node_q_updated:
+            rival_quote |= {
+                "updated_at": rival_quote.get("updated_at", rival_tweet["updated_at"]),
+                "updated_at_ms": rival_q_updated,
+                **(node_quote if node_quote.get("user_nick") is not None else {}),
+                "tombstone": node_quote["tombstone"],
+                "tombstone_updated_at": node_tweet["updated_at"],
+                "tombstone_updated_at_ms": node_tweet["updated_at_ms"],
+            }
+            node_tweet["quoted_tweet"] = rival_quote
+            changed = True
+    return node_tweet, changed
+
+
+def _orig_photo_url(media_url):
+    if "?" not in media_url:
+        return f"{media_url}?name=orig"
+    url = urlparse(media_url)
+    query = parse_qs(url.query)
+    query["name"] = ["orig"]
+    return url._replace(query=urlencode(query, doseq=True)).geturl()
+
+
+def _extract_media(legacy):
+    # 优先 extended_entities
+    entities = legacy.get("extended_entities") or legacy.get("entities", {})
+    media = []
+    for entry in entities.get("media", ()):
+        media_url = None
+        media_type = entry.get("type")
+        if media_type == "photo":
+            media_url = _orig_photo_url(entry["media_url_https"])
+        elif media_type in ("video", "animated_gif"):
+            highest_bitrate = -1
+            for v in entry.get("video_info", {}).get("variants", ()):
+                if v.get("content_type", "").startswith("video"):
+                    bitrate = v.get("bitrate", -1)
+                    if bitrate > highest_bitrate:
+                        highest_bitrate = bitrate
+                        media_url = v.get("url")
+                    elif highest_bitrate == -1:
+                        media_url = v.get("url")
+        media.append({"type": media_type, "media_url": media_url})
+    return media
+
+
+def _unwrap(result):
+    if result.get("__typename") == "TweetWithVisibilityResults":
+        return result.get("tweet", {})
+    return result
+
+
+class TweetRecord:
+    __slots__ = (
+        "tweet_id",
+        "user_id",
+        "user_name",
+        "user_nick",
+        "user_avatar_url",
+        "tweet_content",
+        "media",
+        "tweet_created_at",
+        "tweet_created_at_ms",
+        "quoted_tweet",
+        "retweeted_tweet",
+        "view_count",
+        "favorite_count",
+        "reply_count",
+        "retweet_count",
+        "quote_count",
+        "in_reply_to_status_id",
+        "in_reply_to_screen_name",
+    )
+
+    @classmethod
+    def from_key_data(cls, key_data):
+        """由 tweet_results.result 构造；字段缺失时抛出 KeyError。"""
+        self = cls.__new__(cls)
+        legacy = key_data["legacy"]
+        user = key_data["core"]["user_results"]["result"]["legacy"]
+
+        self.tweet_id = legacy["id_str"]
+        self.user_id = legacy["user_id_str"]
+        self.user_name = user["screen_name"]
+        self.user_nick = user["name"]
+        self.user_avatar_url = user["profile_image_url_https"]
+        # 优先 note_tweet 里的长文本
+        note = key_data.get("note_tweet")
+        note_text = note and note.get("note_tweet_results", {}).get("result", {}).get(
+            "text"
+        )
+        self.tweet_content = note_text or legacy["full_text"]
+        self.media = _extract_media(legacy)
+        self.tweet_created_at, self.tweet_created_at_ms = twitter_time_to_display(
+            legacy["created_at"]
+        )
+        try:
+            self.view_count = int(key_data.get("views", {}).get("count"))
+        except (TypeError, ValueError):
+            self.view_count = 0
+        self.favorite_count = legacy.get("favorite_count", 0)
+        self.reply_count = legacy.get("reply_count", 0)
+        self.retweet_count = legacy.get("retweet_count", 0)
+        self.quote_count = legacy.get("quote_count", 0)
+        self.in_reply_to_status_id = legacy.get("in_reply_to_status_id_str")
+        self.in_reply_to_screen_name = legacy.get("in_reply_to_screen_name")
+
+        self.quoted_tweet = None
+        quoted_status_result = key_data.get("quoted_status_result")
+        if isinstance(quoted_status_result, dict) and "result" in quoted_status_result:
+            quoted_result = quoted_status_result["result"]
+            if quoted_result.get("__typename") == "TweetTombstone":
+                self.quoted_tweet = _tombstone_quote(legacy, quoted_result)
+            else:
+                quoted_result = _unwrap(quoted_result)
+                if quoted_result.get("legacy"):
+                    self.quoted_tweet = cls.from_key_data(quoted_result)
+
+        self.retweeted_tweet = None
+        retweeted_status_result = legacy.get("retweeted_status_result")
+        if (
+            isinstance(retweeted_status_result, dict)
+            and "result" in retweeted_status_result
+        ):
+            retweeted_result = retweeted_status_result["result"]
+            if retweeted_result.get("legacy"):
+                self.retweeted_tweet = cls.from_key_data(retweeted_result)
+        return self
+
+    def as_json(self):
+        quoted = self.quoted_tweet
+        retweeted = self.retweeted_tweet
+        return {
+            "tweet_id": self.tweet_id,
+            "user_id": self.user_id,
+            "user_name": self.user_name,
+            "user_nick": self.user_nick,
+            "avatar": {"media_url": self.user_avatar_url},
+            "tweet_content": self.tweet_content,
+            "tweet_media": self.media,
+            "tweet_created_at": self.tweet_created_at,
+            "tweet_created_at_ms": self.tweet_created_at_ms,
+            "quoted_tweet": (
+                quoted.as_json() if isinstance(quoted, TweetRecord) else quoted
+            ),
+            "retweeted_tweet": retweeted.as_json() if retweeted else None,
+            "view_count": self.view_count,
+            "favorite_count": self.favorite_count,
+            "reply_count": self.reply_count,
+            "retweet_count": self.retweet_count,
+            "quote_count": self.quote_count,
+            "in_reply_to_status_id": self.in_reply_to_status_id,
+            "in_reply_to_screen_name": self.in_reply_to_screen_name,
+        }
+
+
+def _tombstone_quote(legacy, quoted_result):
+    quoted_tweet_url = legacy.get("quoted_status_permalink", {}).get("expanded")
+    return {
+        "tweet_id": legacy.get("quoted_status_id_str"),
+        "user_id": None,
+        "user_name": urlparse(quoted_tweet_url).path.split("/")[1],
+        "tombstone": quoted_result.get("tombstone", {}).get("text", {}).get("text"),
+    }
+
+
+def parse_entry(entry):
+    """解析 Likes 时间线条目，返回 (类型, TweetRecord 或 None)。
+
+    类型为 tweet / cursor / advertisement / tombstone（已删除的推文）/
+    unknown_type。
+    """
+    content = entry.get("content")
+    if not content:
+        return "unknown_type", None
+    if content.get("__typename") == "TimelineTimelineCursor":
+        return "cursor", None
+    item_content = content.get("itemContent")
+    if not item_content:
+        return "unknown_type", None
+    if item_content.get("promotedMetadata"):  # exclude advertisement
+        return "advertisement", None
+    key_data = _unwrap(item_content["tweet_results"]["result"])
+    if key_data.get("__typename") == "TweetTombstone":
+        return "tombstone", None
+    if not key_data.get("legacy"):
+        return "unknown_type", None
+    return "tweet", TweetRecord.from_key_data(key_data)
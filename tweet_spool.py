@@ -0,0 +1,43 @@
+import json
+import os
+import tempfile
+
+
+class TweetSpool:
+    """磁盘暂存的推文表：推文写入临时文件，内存中只保留 ID -> (偏移, 长度)。
+
+    接口与 dict 相同（``in`` / 取值 / 赋值 / 迭代 ID / len），
+    供流式合并代替内存中的推文字典。同一 ID 重新赋值时追加新记录，旧记录作废。
+    """
+
+    def __init__(self, directory):
+        fd, path = tempfile.mkstemp(prefix=".merge-", suffix=".spool", dir=directory)
+        self._file = os.fdopen(fd, "w+b")
+        self.path = path
+        self._index = {}
+        self._end = 0
+
+    def __contains__(self, tweet_id):
+        return tweet_id in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __getitem__(self, tweet_id):
+        offset, length = self._index[tweet_id]
+        self._file.seek(offset)
+        return json.loads(self._file.read(length))
+
+    def __setitem__(self, tweet_id, tweet):
+        data = json.dumps(tweet, ensure_ascii=False, default=str).encode("utf-8")
+        self._file.seek(self._end)
+        self._file.write(data)
+        self._index[tweet_id] = (self._end, len(data))
+        self._end += len(data)
+
+    def close(self):
+        self._file.close()
+        os.unlink(self.path)